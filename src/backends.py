@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from collections import namedtuple
+from importlib import import_module
+from itertools import count
+import multiprocessing
+from statistics import median
+import time
+
+from catalog import puzzles
+from geometry import bit, bits, setup_area, stratego
+from scout_bomb_independence import budgets
+
+# The puzzles as 0-1 linear programs, independent of any solver: each grid maps the squares that can hold its pieces to
+# numbered variables, and each constraint is a list of (variable, coefficient) terms with a sense and a right-hand side.
+# The engines translate such a program for Z3 (pseudo-Boolean constraints), OR-Tools CP-SAT, or HiGHS (through SciPy).
+# Only Z3 is required: CP-SAT and SciPy are imported when their engine is used.
+Program = namedtuple('Program', ['board', 'grids', 'size', 'constraints', 'goal', 'objective'])
+
+# Engine results: the verdict is 'sat' for a proven optimum and 'unknown' otherwise, as for the scripts
+Solution = namedtuple('Solution', ['verdict', 'value', 'pieces'])
+
+def numbered(area, counter):
+    return { sq: next(counter) for sq in bits(area) }
+
+# Puzzles I and II: each window of each shape in the setup area holds a bomb (set cover)
+def bomb_domination(windows=((2, 3), (3, 2)), **_):
+    board, n = setup_area, count()
+    bombs = numbered(board.open, n)
+    constraints = [
+        ([ (bombs[board.square(r + i, c + j)], 1) for i in range(h) for j in range(w) ], '>=', 1)
+        for (h, w) in windows
+        if h <= board.H and w <= board.W
+        for r in range(board.H - h + 1)
+        for c in range(board.W - w + 1)
+    ]
+    return Program(board, { 'bombs': bombs }, next(n), constraints, 'min', [ (v, 1) for v in bombs.values() ])
+
+# Puzzle III: each square is occupied or threatened by a scout (set cover)
+def scout_domination(**_):
+    board, n = stratego, count()
+    scouts = numbered(board.open, n)
+    constraints = [
+        ([ (scouts[t], 1) for t in bits(bit(sq) | board.attacks[sq]) ], '>=', 1)
+        for sq in bits(board.open)
+    ]
+    return Program(board, { 'scouts': scouts }, next(n), constraints, 'min', [ (v, 1) for v in scouts.values() ])
+
+# Puzzle IV: at most one scout per segment (set packing)
+def scout_independence(**_):
+    board, n = stratego, count()
+    scouts = numbered(board.open, n)
+    constraints = [ ([ (scouts[sq], 1) for sq in bits(m) ], '<=', 1) for m in board.segment_masks ]
+    return Program(board, { 'scouts': scouts }, next(n), constraints, 'max', [ (v, 1) for v in scouts.values() ])
+
+# Puzzle V: the pair encoding of scout_cover.py. The scouts are the squares of the chosen pairs of squares that threaten
+# each other, and each segment holds the squares of at most one chosen pair.
+def scout_cover(**_):
+    board, n = stratego, count()
+    scouts = numbered(board.open, n)
+    pairs = { (a, b): next(n) for a in bits(board.open) for b in bits(board.attacks[a]) if a < b }
+    constraints = [
+        ([ (scouts[sq], 1) ] + [ (p, -1) for (a, b), p in pairs.items() if sq in (a, b) ], '==', 0)
+        for sq in bits(board.open)
+    ] + [
+        ([ (p, 1) for (a, b), p in pairs.items() if (bit(a) | bit(b)) & m ], '<=', 1)
+        for m in board.segment_masks
+    ]
+    return Program(board, { 'scouts': scouts }, next(n), constraints, 'max', [ (v, 1) for v in scouts.values() ])
+
+# Puzzle VI: at most the budget of bombs in each setup area (the same for both, or one each), no scout on a bomb, and two scouts
+# on a segment need a bomb between them.
+# The bombs inside each interval of a segment split it into one more compartment than there are bombs, each with at most one
+# scout. These interval constraints contain the pairwise ones (the scouts at the ends of the interval), and have a much
+# stronger LP relaxation (HiGHS proves the optimum in 0.8 instead of 53 seconds).
+def scout_bomb_independence(budget=6, **_):
+    board, n = stratego, count()
+    scouts = numbered(board.open, n)
+    bombs = numbered(board.open & (board.red_setup | board.blu_setup), n)
+    constraints = [
+        ([ (scouts[sq], 1), (bombs[sq], 1) ], '<=', 1) for sq in bombs
+    ] + [
+        ([ (bombs[sq], 1) for sq in bits(area) ], '<=', bound)
+        for area, bound in zip((board.red_setup, board.blu_setup), budgets(budget) if budget is not None else (None, None))
+        if bound is not None
+    ] + [
+        ([ (scouts[t], 1) for t in bits(board.between[(a, b)] | bit(a) | bit(b)) ] + [ (bombs[t], -1) for t in bits(board.between[(a, b)]) if t in bombs ], '<=', 1)
+        for m in board.segment_masks
+        for a in bits(m)
+        for b in bits(m)
+        if a < b
+    ]
+    return Program(board, { 'scouts': scouts, 'bombs': bombs }, next(n), constraints, 'max', [ (v, 1) for v in scouts.values() ])
+
+programs = {
+    'bomb_domination':         bomb_domination,
+    'scout_domination':        scout_domination,
+    'scout_independence':      scout_independence,
+    'scout_cover':             scout_cover,
+    'scout_bomb_independence': scout_bomb_independence
+}
+
+# Each engine translates a program into the model of its solver, and returns a function that solves the model
+# within an optional time limit, into a verdict and the values of the variables (None if there is no solution)
+
+# Z3's optimizer runs a single thread
+def z3(program, threads=1, timeout=None):
+    from z3 import Bool, If, is_true, Optimize, PbEq, PbGe, PbLe, sat, Sum
+    x = [ Bool("x_%s" % v) for v in range(program.size) ]
+    relations = { '<=': PbLe, '>=': PbGe, '==': PbEq }
+    s = Optimize()
+    s.add([ relations[sense]([ (x[v], c) for v, c in terms ], rhs) for terms, sense, rhs in program.constraints ])
+    objective = Sum([ If(x[v], c, 0) for v, c in program.objective ])
+    s.minimize(objective) if program.goal == 'min' else s.maximize(objective)
+
+    def run():
+        if timeout:
+            s.set(timeout=int(1000 * timeout))
+        if s.check() != sat:
+            return 'unknown', None
+        m = s.model()
+        return 'sat', [ is_true(m.evaluate(xv, model_completion=True)) for xv in x ]
+    return run
+
+def cpsat(program, threads=8, timeout=None):
+    from ortools.sat.python import cp_model
+    m = cp_model.CpModel()
+    x = [ m.new_bool_var("x_%s" % v) for v in range(program.size) ]
+    for terms, sense, rhs in program.constraints:
+        lhs = cp_model.LinearExpr.weighted_sum([ x[v] for v, _ in terms ], [ c for _, c in terms ])
+        m.add(lhs <= rhs if sense == '<=' else lhs >= rhs if sense == '>=' else lhs == rhs)
+    objective = cp_model.LinearExpr.weighted_sum([ x[v] for v, _ in program.objective ], [ c for _, c in program.objective ])
+    m.minimize(objective) if program.goal == 'min' else m.maximize(objective)
+
+    def run():
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = threads
+        if timeout:
+            solver.parameters.max_time_in_seconds = timeout
+        status = solver.solve(m)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return 'unknown', None
+        return 'sat' if status == cp_model.OPTIMAL else 'unknown', [ solver.boolean_value(xv) for xv in x ]
+    return run
+
+# SciPy's interface to HiGHS runs a single thread
+def highs(program, threads=1, timeout=None):
+    import numpy as np
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_array
+    rows, cols, data = zip(*[ (i, v, c) for i, (terms, _, _) in enumerate(program.constraints) for v, c in terms ])
+    A = coo_array((data, (rows, cols)), shape=(len(program.constraints), program.size)).tocsr()
+    lower = [ rhs if sense in ('>=', '==') else -np.inf for _, sense, rhs in program.constraints ]
+    upper = [ rhs if sense in ('<=', '==') else np.inf for _, sense, rhs in program.constraints ]
+    c = np.zeros(program.size)
+    for v, coefficient in program.objective:
+        c[v] = coefficient if program.goal == 'min' else -coefficient
+
+    def run():
+        result = milp(c, constraints=LinearConstraint(A, lower, upper), integrality=np.ones(program.size), bounds=Bounds(0, 1), options={ 'time_limit': timeout } if timeout else {})
+        if result.x is None:
+            return 'unknown', None
+        return 'sat' if result.status == 0 else 'unknown', list(result.x > 0.5)
+    return run
+
+engines = {
+    'z3':    z3,
+    'cpsat': cpsat,
+    'highs': highs
+}
+
+# The modules of each engine, which are imported before the timings start
+requires = {
+    'z3':    'z3',
+    'cpsat': 'ortools.sat.python.cp_model',
+    'highs': 'scipy.optimize'
+}
+
+# Solve a puzzle with an engine, with the time to build the program and the model of the engine, and the time to solve it
+def solve(puzzle, engine='cpsat', threads=1, timeout=None):
+    module, kwargs = puzzles[puzzle]
+    import_module(requires[engine])
+    start = time.perf_counter()
+    program = programs[module](**kwargs)
+    run = engines[engine](program, threads, timeout)
+    built = time.perf_counter()
+    verdict, values = run()
+    solved = time.perf_counter()
+    if values is None:
+        return Solution(verdict, None, {}), { 'model': built - start, 'solve': solved - built }
+    pieces = { name: sum(bit(sq) for sq, v in grid.items() if values[v]) for name, grid in program.grids.items() }
+    value = sum(c for v, c in program.objective if values[v])
+    return Solution(verdict, value, pieces), { 'model': built - start, 'solve': solved - built }
+
+def run(task):
+    puzzle, engine, threads, timeout = task
+    try:
+        solution, times = solve(puzzle, engine, threads, timeout)
+    except ImportError as e:
+        return puzzle, engine, None, "%s is not installed" % e.name
+    from verify import verified
+    module, kwargs = puzzles[puzzle]
+    assert solution.value is None or verified(module, solution.pieces, **kwargs)
+    return puzzle, engine, solution, times
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the puzzles as 0-1 linear programs with Z3, OR-Tools CP-SAT or HiGHS, and compare their timings.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to solve (default: all)")
+    parser.add_argument('--engine', nargs='*', default=list(engines), help="engines to compare (default: all)")
+    parser.add_argument('--threads', type=int, default=8, help="number of threads of the engines that use them")
+    parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS', help="time limit of each solve")
+    parser.add_argument('--repeat', type=int, default=1, help="number of runs per puzzle and engine (the median is reported)")
+    args = parser.parse_args()
+
+    # Each run in a fresh process, as in benchmark.py
+    tasks = [ (puzzle, engine, args.threads, args.timeout) for puzzle in args.puzzles for engine in args.engine for _ in range(args.repeat) ]
+    runs = {}
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for puzzle, engine, solution, times in pool.imap(run, tasks):
+            runs.setdefault((puzzle, engine), []).append((solution, times))
+
+    print("%-8s%-8s%10s%10s%8s%10s" % ('puzzle', 'engine', 'model', 'solve', 'value', 'verdict'))
+    for (puzzle, engine), results in runs.items():
+        solution, times = results[0]
+        if solution is None:
+            print("%-8s%-8s  %s" % (puzzle, engine, times))
+            continue
+        print("%-8s%-8s%10.3f%10.3f%8s%10s" % (
+            puzzle, engine, median(t['model'] for _, t in results), median(t['solve'] for _, t in results),
+            solution.value, solution.verdict
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from importlib import import_module
+import json
+import multiprocessing
+import platform
+from statistics import median
+import sys
+from z3 import get_version_string
+
+from cardinality import encodings
+from puzzle import counter, counters, Log, puzzles
+
+phases = [ 'variables', 'constraints', 'solve', 'decode' ]
+
+def run(task):
+    puzzle, index, options, path = task
+    module, kwargs = puzzles[puzzle]
+    stats = {}
+    log = Log(path, echo=False, puzzle=puzzle, run=index) if path else None
+    result = import_module(module).solve(stats=stats, log=log, **dict(kwargs, **options))
+    stats['model'] = stats['variables'] + stats['constraints']
+    return puzzle, dict(stats, verdict=result.verdict, value=result.value)
+
+def summary(runs):
+    return dict(
+        { phase: median(run.get(phase, 0) for run in runs) for phase in [ 'model' ] + phases },
+        **{ key: median(counter(run['statistics'], names) for run in runs) for key, names in counters.items() },
+        verdict=runs[0]['verdict'], value=runs[0]['value']
+    )
+
+# Repeat each puzzle in a fresh process per run, since the terms that earlier runs leave behind in Z3 change the search of later runs
+# The phase timings and the progress of each run can also be appended to a structured log.
+def benchmark(names, repeat=3, log=None, **options):
+    runs = { name: [] for name in names }
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for name, run_stats in pool.imap(run, [ (name, index, options, log) for name in names for index in range(repeat) ]):
+            runs[name].append(run_stats)
+    return {
+        'z3': get_version_string(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'options': options,
+        'puzzles': { name: dict(summary(r), runs=r) for name, r in runs.items() }
+    }
+
+# Puzzles whose answer changed, or whose median solve time grew by more than the tolerance (and by more than the noise floor)
+def regressions(results, baseline, tolerance=1.25, noise=0.1):
+    for name, current in results['puzzles'].items():
+        if name not in baseline['puzzles']:
+            continue
+        previous = baseline['puzzles'][name]
+        if (current['verdict'], current['value']) != (previous['verdict'], previous['value']):
+            yield name, "answer changed from %s (%s) to %s (%s)" % (previous['value'], previous['verdict'], current['value'], current['verdict'])
+        elif current['solve'] > tolerance * previous['solve'] and current['solve'] - previous['solve'] > noise:
+            yield name, "solve time grew from %.2f to %.2f seconds" % (previous['solve'], current['solve'])
+
+def report(results, baseline=None):
+    print("%-6s%10s%10s%12s%12s%12s%8s%10s" % ('puzzle', 'model', 'solve', 'conflicts', 'decisions', 'memory', 'value', 'baseline'))
+    for name, p in results['puzzles'].items():
+        previous = baseline['puzzles'].get(name) if baseline else None
+        print("%-6s%10.3f%10.3f%12d%12d%12.1f%8s%10s" % (
+            name, p['model'], p['solve'], p['conflicts'], p['decisions'], p['max memory'],
+            p['value'] if p['verdict'] == 'sat' else '?',
+            "x%.2f" % (p['solve'] / previous['solve']) if previous and previous['solve'] > 0 else ''
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the puzzles: time model construction and solving over repeated runs, and compare against a baseline.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to benchmark (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="number of runs per puzzle (the median is reported)")
+    parser.add_argument('--cardinality', choices=encodings, default='native', help="encoding of the cardinality constraints")
+    parser.add_argument('--param', nargs=2, action='append', default=[], metavar=('KEY', 'VALUE'), help="set a Z3 parameter, e.g. timeout 60000")
+    parser.add_argument('--progress', type=float, default=None, metavar='SECONDS', help="log the progress of the search at this interval")
+    parser.add_argument('--log', default=None, metavar='FILE', help="append the structured log of all runs as JSON lines to this file")
+    parser.add_argument('--output', default=None, help="write the results as JSON to this file")
+    parser.add_argument('--baseline', default=None, help="compare against the JSON results in this file")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="maximum ratio of the solve time over the baseline")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    options = { 'cardinality': args.cardinality, 'params': [ (key, value) for key, value in args.param ] }
+    if args.progress:
+        options['progress'] = args.progress
+    results = benchmark(args.puzzles, args.repeat, args.log, **options)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if baseline:
+        found = list(regressions(results, baseline, args.tolerance))
+        for name, message in found:
+            print("Regression in puzzle %s: %s." % (name, message))
+        sys.exit(1 if found else 0)
+
+if __name__ == '__main__':
+    main()
@@ -5,68 +5,102 @@
 #    (See accompanying file LICENSE_1_0.txt or copy at
 #          http://www.boost.org/LICENSE_1_0.txt)
 
+import argparse
 from itertools import product
-import numpy as np
-from z3 import Bool, If, Optimize, PbGe, Sum, sat
+
+from cardinality import at_least
+from catalog import diagram
+from geometry import setup_area
+from puzzle import add, add_arguments, laps, options, Result, solution, solvers, variables
+from symmetry import symmetry_breaking
+from transfer_matrix import transfer_matrix
+from verify import verified
 
 # Stratego setup area
-H, W =  4, 10
+area = setup_area
+H, W = setup_area.H, setup_area.W
 
 def rectangle(h, w):
     return product(range(h), range(w))
 
-# Board display
-def piece(model, r, c):
-    return 'B' if model.evaluate(is_bomb[r][c]) else '.'
-
-def diagram(model):
-    board = np.array([ piece(model, r, c) for (r, c) in rectangle(H, W) ]).reshape(H, W)
-    return "%s" % '\n'.join(map(lambda row: ' '.join(map(str, row)), board))
-
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=11667
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=441746
-print("The minimum number of bombs on a Stratego setup area such that each 2x3 and 3x2 rectangle has at least one bomb.")
-
-# Variables
-is_bomb = np.array([ Bool("is_bomb_%s%s" % (r, c)) for (r, c) in rectangle(H, W) ]).reshape(H, W).tolist()
-
-# Bomb placement
-def at_least_one_bomb_for_each_rectangle(h, w):
-    return [
-        PbGe([
-            (is_bomb[r + dr][c + dc], 1)
-            for (dr, dc) in rectangle(h, w)
-        ], 1)
-        for (r, c) in rectangle(H - h + 1, W - w + 1)
-    ]
-
-# Clauses
-s = Optimize()
-s.add(at_least_one_bomb_for_each_rectangle(2, 3))
-s.add(at_least_one_bomb_for_each_rectangle(3, 2))
-
-# Objective
-num_bombs = Sum([ If(is_bomb[r][c], 1, 0) for (r, c) in rectangle(H, W) ])
-min_bombs = s.minimize(num_bombs)
-
-if s.check() == sat:
-    assert s.lower(min_bombs) == 6
-    print("The minimum number of bombs satisfying the constraints == %s." % s.lower(min_bombs))
-    print(diagram(s.model()))
-else:
-    print("Z3 failed to find a solution.")
-
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=11661
 # http://forum.stratego.com/topic/1146-stratego-quizz-and-training-forum-answers/?p=11813
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=441745
-print("The minimum number of bombs on a Stratego setup area such that each 2x3, 3x2 and 1x6 rectangle has at least one bomb.")
+def title(windows):
+    names = [ "%sx%s" % (h, w) for (h, w) in windows ]
+    return "The minimum number of bombs on a Stratego setup area such that each %s rectangle has at least one bomb." % (
+        ' and '.join(names) if len(names) < 3 else ', '.join(names[:-1]) + ' and ' + names[-1]
+    )
+
+# Grid of pieces whose number is optimized
+objective = 'bombs'
+
+def model(solver='optimize', symmetry=False, order=None, cardinality='native', windows=((2, 3), (3, 2)), lap=None):
+    lap = lap or laps()
+
+    # Variables
+    is_bomb = variables(setup_area, 'is_bomb')
+    lap('variables')
+
+    # Bomb placement
+    def at_least_one_bomb_for_each_rectangle(h, w):
+        return [
+            constraint
+            for (r, c) in rectangle(H - h + 1, W - w + 1)
+            for constraint in at_least([ is_bomb[r + dr][c + dc] for (dr, dc) in rectangle(h, w) ], 1, cardinality)
+        ]
+
+    # Clauses
+    s = solvers[solver]()
+    add(s, [ constraint for (h, w) in windows for constraint in at_least_one_bomb_for_each_rectangle(h, w) ], order)
+
+    # Symmetry breaking
+    if symmetry:
+        s.add(symmetry_breaking(setup_area, [ is_bomb ]))
+
+    lap('constraints')
+    return s, { 'bombs': is_bomb }
+
+def solve(engine='z3', **kwargs):
+    if engine == 'dp':
+        min_bombs, _, layout = transfer_matrix(kwargs.get('windows', ((2, 3), (3, 2))))
+        return Result('sat', min_bombs, { 'bombs': layout })
+
+    # Objective
+    return solution(__name__, setup_area, 'bombs', 'min', H * W, **kwargs)
+
+def main():
+    parser = add_arguments(argparse.ArgumentParser(description="The minimum number of bombs on a Stratego setup area such that each rectangle of a given shape has at least one bomb."), 'optimize')
+    parser.add_argument('--engine', choices=[ 'z3', 'dp' ], default='z3', help="solve with Z3, or with transfer-matrix dynamic programming that also counts the optimal layouts")
+    parser.add_argument('--window', type=lambda shape: tuple(map(int, shape.split('x'))), action='append', default=None, metavar='HxW', help="rectangle shape that needs a bomb (repeatable; default: puzzles I and II)")
+    parser.add_argument('--width', type=int, default=W, help="width of the strip (dp engine only)")
+    args = parser.parse_args()
+    if args.engine == 'z3' and args.width != W:
+        parser.error("--width requires --engine dp")
 
-# Extra clause
-s.add(at_least_one_bomb_for_each_rectangle(1, 6))
+    for windows, min_bombs in [
+        ([ (2, 3), (3, 2) ], 6),
+        ([ (2, 3), (3, 2), (1, 6) ], 7)
+    ] if args.window is None else [ (args.window, None) ]:
+        print(title(windows))
+        if args.engine == 'dp':
+            value, num_layouts, layout = transfer_matrix(windows, H, args.width)
+            assert min_bombs is None or args.width != W or value == min_bombs
+            print("The minimum number of bombs satisfying the constraints == %s (in %s optimal layouts)." % (value, num_layouts))
+            if args.width == W:
+                assert verified('bomb_domination', { 'bombs': layout }, windows=windows)
+                print(diagram(setup_area, { 'bombs': layout }))
+            continue
+        result = solve(windows=windows, **options(args))
+        if result.verdict == 'sat':
+            assert min_bombs is None or result.value == min_bombs
+            assert verified('bomb_domination', result.pieces, windows=windows)
+            print("The minimum number of bombs satisfying the constraints == %s." % result.value)
+            print(diagram(setup_area, result.pieces))
+        else:
+            print("Z3 failed to find a solution.")
 
-if s.check() == sat:
-    assert s.lower(min_bombs) == 7
-    print("The minimum number of bombs satisfying the constraints == %s." % s.lower(min_bombs))
-    print(diagram(s.model()))
-else:
-    print("Z3 failed to find a solution.")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from collections import namedtuple
+from fractions import Fraction
+from math import ceil, floor
+import time
+from z3 import Optimize, Real, sat, Sum
+
+from branch_and_bound import matching, segment_bound
+from geometry import bit, bits, popcount, stratego
+from transfer_matrix import transfer_matrix
+
+# Bounds on the optimum of a puzzle, computed before the search. Feasible solutions (greedy or exact) bound the optimum
+# from the side of the goal, relaxations (clique covers, LPs and counting arguments) from the other side.
+Bound = namedtuple('Bound', ['name', 'side', 'value'])
+
+# Closed neighbourhood of a square: the squares on its row and column segments
+def neighbourhood(board, sq):
+    return board.row_masks[board.row_of[sq]] | board.col_masks[board.col_of[sq]]
+
+# Upper bound for domination: repeatedly place a scout on the square that dominates the most undominated squares
+def greedy_domination(board):
+    scouts, undominated = 0, board.open
+    while undominated:
+        sq = max(bits(board.open), key=lambda sq: popcount(neighbourhood(board, sq) & undominated))
+        scouts |= bit(sq)
+        undominated &= ~neighbourhood(board, sq)
+    return scouts
+
+# Lower bound for domination: squares with pairwise disjoint closed neighbourhoods each need their own scout
+def greedy_packing(board):
+    packing, covered = 0, 0
+    for sq in sorted(bits(board.open), key=lambda sq: popcount(neighbourhood(board, sq))):
+        if not neighbourhood(board, sq) & covered:
+            packing |= bit(sq)
+            covered |= neighbourhood(board, sq)
+    return packing
+
+# Lower bound for domination: the LP relaxation of the set cover by closed neighbourhoods, solved exactly over the rationals
+def lp_domination(board):
+    x = { sq: Real("x_%s" % sq) for sq in bits(board.open) }
+    s = Optimize()
+    s.add([ c for v in x.values() for c in (v >= 0, v <= 1) ])
+    s.add([ Sum([ x[t] for t in bits(neighbourhood(board, sq)) ]) >= 1 for sq in bits(board.open) ])
+    h = s.minimize(Sum(list(x.values())))
+    assert s.check() == sat
+    return ceil(Fraction(h.value().as_string()))
+
+# Lower bound for puzzle V: greedily pair two scouts on a segment whose other segments are still unused.
+# Each scout then threatens exactly its partner, and no segment holds more than two scouts.
+def greedy_pairs(board):
+    def segments(sq):
+        return { board.row_of[sq], len(board.row_masks) + board.col_of[sq] }
+
+    scouts, used = 0, set()
+    for m in board.segment_masks:
+        for a in bits(m):
+            for b in bits(m):
+                others = segments(a) | segments(b)
+                if a < b and not others & used:
+                    scouts |= bit(a) | bit(b)
+                    used |= others
+    return scouts
+
+# Upper bound for puzzle V: each scout threatens exactly one other scout, so the scouts form pairs on a common segment,
+# and the other segment of each scout holds no other scout. A pair on a row segment uses up one row and two column segments,
+# a pair on a column segment two row segments and one column segment.
+def pair_bound(board):
+    R, C = len(board.row_masks), len(board.col_masks)
+    return 2 * max(p + min(R - 2 * p, (C - p) // 2) for p in range(min(R // 2, C) + 1))
+
+# Upper bound for puzzle VI: the LP relaxation of the per-segment bomb condition and the bomb budgets (without the threats).
+# The budget is the same for both setup areas, or a (red, blue) pair.
+def lp_scout_bomb(board, budget=6):
+    red, blue = budget if isinstance(budget, (tuple, list)) else (budget, budget)
+    squares = list(bits(board.open))
+    x = { sq: Real("x_%s" % sq) for sq in squares }
+    y = { sq: Real("y_%s" % sq) for sq in squares }
+    s = Optimize()
+    s.add([ c for sq in squares for c in (x[sq] >= 0, y[sq] >= 0, x[sq] + y[sq] <= 1) ])
+    s.add([ y[sq] == 0 for sq in bits(board.dmz) ])
+    s.add([ Sum([ y[sq] for sq in bits(area) ]) <= n for area, n in ((board.red_setup, red), (board.blu_setup, blue)) ])
+    s.add([ Sum([ x[sq] for sq in bits(m) ]) <= Sum([ y[sq] for sq in bits(m) ]) + 1 for m in board.segment_masks ])
+    h = s.maximize(Sum(list(x.values())))
+    assert s.check() == sat
+    return floor(Fraction(h.value().as_string()))
+
+def bomb_domination(windows=((2, 3), (3, 2)), **_):
+    min_bombs, _, _ = transfer_matrix(windows)
+    return [ Bound('transfer matrix', 'lower', min_bombs), Bound('transfer matrix', 'upper', min_bombs) ]
+
+def scout_domination(**_):
+    return [
+        Bound('greedy', 'upper', popcount(greedy_domination(stratego))),
+        Bound('packing', 'lower', popcount(greedy_packing(stratego))),
+        Bound('lp', 'lower', lp_domination(stratego))
+    ]
+
+def scout_independence(**_):
+    return [
+        Bound('matching', 'lower', popcount(matching(stratego, stratego.open))),
+        Bound('clique cover', 'upper', segment_bound(stratego, stratego.open)),
+        Bound('matching', 'upper', popcount(matching(stratego, stratego.open)))
+    ]
+
+def scout_cover(**_):
+    return [
+        Bound('greedy', 'lower', popcount(greedy_pairs(stratego))),
+        Bound('segments', 'upper', len(stratego.segments) // 2 * 2),
+        Bound('pairs', 'upper', pair_bound(stratego))
+    ]
+
+# Without bombs, the scouts of puzzle IV are feasible for puzzle VI
+def scout_bomb_independence(budget=6, **_):
+    red, blue = budget if isinstance(budget, (tuple, list)) else (budget, budget)
+    return [
+        Bound('matching', 'lower', popcount(matching(stratego, stratego.open))),
+        Bound('segments', 'upper', len(stratego.row_masks) + red + blue),
+        Bound('lp', 'upper', lp_scout_bomb(stratego, budget))
+    ]
+
+engines = {
+    'bomb_domination':         bomb_domination,
+    'scout_domination':        scout_domination,
+    'scout_independence':      scout_independence,
+    'scout_cover':             scout_cover,
+    'scout_bomb_independence': scout_bomb_independence
+}
+
+# The tightest lower and upper bound on the optimum
+def interval(bounds):
+    return (
+        max(b.value for b in bounds if b.side == 'lower'),
+        min(b.value for b in bounds if b.side == 'upper')
+    )
+
+# Bounds to seed the search of a script with, logged together with their gap
+def bracket(module, log=None, **kwargs):
+    lower, upper = interval(engines[module](**kwargs))
+    if log:
+        log('bounds', lower=lower, upper=upper, gap=upper - lower)
+    return lower, upper
+
+def main():
+    from puzzle import puzzles
+
+    parser = argparse.ArgumentParser(description="Compute lower and upper bounds on the optima of the puzzles before the search.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to bound (default: all)")
+    args = parser.parse_args()
+
+    for puzzle in args.puzzles:
+        module, kwargs = puzzles[puzzle]
+        start = time.perf_counter()
+        bounds = engines[module](**kwargs)
+        lower, upper = interval(bounds)
+        elapsed = time.perf_counter() - start
+        print("Puzzle %s: %s <= N <= %s (gap %s, %.2f seconds)" % (puzzle, lower, upper, upper - lower, elapsed))
+        for b in bounds:
+            print("    %-5s %-16s %s" % (b.side, b.name, b.value))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from itertools import product
+import random
+import time
+
+from geometry import bit, bits, popcount, random_lakes, scaled, stratego
+
+# Scouts on the same segment threaten each other, so the scout threat graph is the union of the segment cliques.
+# Since each open square lies on one row segment and one column segment, an independent set of scouts is
+# a set of squares with at most one square per segment, i.e. a matching between row and column segments.
+
+# Upper bound: the row segments and the column segments each form a clique cover of the candidate squares
+def segment_bound(board, candidates):
+    return min(
+        sum(1 for m in board.row_masks if m & candidates),
+        sum(1 for m in board.col_masks if m & candidates)
+    )
+
+# Maximum bipartite matching between row and column segments that share a candidate square, as the bitboard of the squares
+# of the matched pairs. These squares are a maximum independent set of scouts among the candidates.
+def matching(board, candidates):
+    match = {}
+
+    def augment(i, seen):
+        for sq in bits(board.row_masks[i] & candidates):
+            j = board.col_of[sq]
+            if j in seen:
+                continue
+            seen.add(j)
+            if j not in match or augment(match[j], seen):
+                match[j] = i
+                return True
+        return False
+
+    for i, m in enumerate(board.row_masks):
+        if m & candidates:
+            augment(i, set())
+    return sum(bit(next(sq for sq in bits(board.row_masks[i] & board.col_masks[j] & candidates))) for j, i in match.items())
+
+# Upper bound: the size of a maximum matching
+def matching_bound(board, candidates):
+    return popcount(matching(board, candidates))
+
+# Among the candidate squares, by default all open squares
+def maximum_independent_set(board=stratego, candidates=None):
+    candidates = board.open if candidates is None else candidates
+    best, best_count = 0, 0
+    upper = matching_bound(board, candidates)
+
+    def search(candidates, chosen, count):
+        nonlocal best, best_count
+        if count > best_count:
+            best, best_count = chosen, count
+        if not candidates or best_count == upper:
+            return
+        if count + segment_bound(board, candidates) <= best_count:
+            return
+        if count + matching_bound(board, candidates) <= best_count:
+            return
+
+        # Branch on the segment with the fewest candidate squares: place a scout on one of them, or leave it empty
+        segment = min((m & candidates for m in board.segment_masks if m & candidates), key=popcount)
+        for sq in bits(segment):
+            search(candidates & ~(bit(sq) | board.attacks[sq]), chosen | bit(sq), count + 1)
+        search(candidates & ~segment, chosen, count)
+
+    search(candidates, 0, 0)
+    return best_count, best
+
+# Exhaustive search over all independent sets of the candidate squares, without any bounds, for checking on small boards
+def exhaustive_independent_set(board=stratego, candidates=None):
+    candidates = board.open if candidates is None else candidates
+    if not candidates:
+        return 0, 0
+    sq = (candidates & -candidates).bit_length() - 1
+    count, chosen = exhaustive_independent_set(board, candidates & ~(bit(sq) | board.attacks[sq]))
+    return max((count + 1, chosen | bit(sq)), exhaustive_independent_set(board, candidates & ~bit(sq)))
+
+def diagram(board, scouts):
+    return board.diagram(lambda r, c: '2' if scouts >> board.square(r, c) & 1 else '.')
+
+# Compare the search, the matching and the segment bound with exhaustive search on small boards with random lakes,
+# for all open squares and for random subsets of them as candidates
+def selfcheck(size=6, seeds=4, densities=(0.0, 0.1, 0.2, 0.3)):
+    failures = []
+    for H, W, density, seed in product(range(1, size + 1), range(1, size + 1), densities, range(seeds)):
+        board, rng = random_lakes(H, W, density, seed), random.Random(seed)
+        for candidates in [ board.open, sum(bit(sq) for sq in bits(board.open) if rng.random() < 0.5) ]:
+            value, _ = exhaustive_independent_set(board, candidates)
+            max_scouts, scouts = maximum_independent_set(board, candidates)
+            matched = matching(board, candidates)
+            if (
+                (max_scouts, popcount(scouts), popcount(matched)) != (value, value, value) or segment_bound(board, candidates) < value or
+                any(board.attacks[sq] & s or not candidates >> sq & 1 for s in (scouts, matched) for sq in bits(s))
+            ):
+                failures.append((H, W, density, seed, candidates, value, max_scouts, popcount(matched)))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Native branch-and-bound solver for the maximum number of non-threatening scouts.")
+    parser.add_argument('--scale', type=int, default=1, help="scale the Stratego board and its lakes by this factor")
+    parser.add_argument('--check', action='store_true', help="check the search and its bounds against exhaustive search on small boards with random lakes instead")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = selfcheck()
+        for H, W, density, seed, candidates, value, max_scouts, matched in failures:
+            print("%sx%s board with lake density %s and seed %s, candidates %s: %s scouts, not %s by the search and %s by the matching" % (
+                H, W, density, seed, hex(candidates), value, max_scouts, matched
+            ))
+        print("The search and its bounds agree with exhaustive search." if not failures else "%s failures." % len(failures))
+        raise SystemExit(1 if failures else 0)
+
+    board = scaled(args.scale) if args.scale > 1 else stratego
+    print("The maximum number of scouts on a %sx%s Stratego board such that no scout threatens another scout." % (board.H, board.W))
+
+    start = time.perf_counter()
+    max_scouts, scouts = maximum_independent_set(board)
+    elapsed = time.perf_counter() - start
+
+    assert popcount(scouts) == max_scouts
+    assert all(not board.attacks[sq] & scouts for sq in bits(scouts))
+    if board is stratego:
+        assert max_scouts == 14
+    print("The maximum number of scouts satisfying the constraints == %s (%.1f ms)." % (max_scouts, 1000 * elapsed))
+    print(diagram(board, scouts))
+
+if __name__ == '__main__':
+    main()
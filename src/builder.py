@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+import multiprocessing
+import time
+from z3 import And, Bool, BoolVal, Implies, Not, Or, SolverFor, Xor
+from z3.z3core import Z3_get_estimated_alloc_size
+
+from cardinality import at_most, exactly
+from geometry import popcount, random_lakes, scaled
+
+# Models of the scout puzzles III, IV, V and VI on any board, such as scaled boards or boards with arbitrary lakes.
+# The scripts constrain each square by the squares on its two segments, so that their models grow with the area times the
+# segment length. Here, the pieces on each segment are counted once, and the constraints of the squares share these counts:
+# the models, and the time and memory to build them, grow linearly with the area. The constraints are generated segment by
+# segment and added to the solver as they come, without first building the whole model as a list.
+
+# Variable names with a separator, since the rows and columns of large boards have more than one digit
+def grid(board, name):
+    return [ [ Bool("%s_%s_%s" % (name, r, c)) for c in range(board.W) ] for r in range(board.H) ]
+
+# Running counts along a segment: at_least[j] == at least j + 1 of the literals so far are true, for j < depth.
+# Returns the constraints that define the counts, and the counts over the whole segment.
+def counter(literals, name, depth):
+    constraints, previous = [], [ BoolVal(False) ] * depth
+    for i, x in enumerate(literals):
+        current = [ Bool("%s_%s_%s" % (name, i, j + 1)) for j in range(depth) ]
+        constraints += [ current[j] == Or(previous[j], And(previous[j - 1], x) if j else x) for j in range(depth) ]
+        previous = current
+    return constraints, previous
+
+# The constraints of the counts of each segment in turn, together with the counts
+def counted(board, is_piece, depth):
+    for k, segment in enumerate(board.segments):
+        yield counter([ is_piece[r][c] for (r, c) in segment ], "count_%s" % k, depth)
+
+# The row and column segment of each open square
+def lines(board):
+    R = len(board.row_masks)
+    for (r, c) in board.open_squares():
+        sq = board.square(r, c)
+        yield r, c, board.row_of[sq], R + board.col_of[sq]
+
+def lakes(board, is_scout):
+    yield [ Not(is_scout[r][c]) for (r, c) in board.lake_squares() ]
+
+# Puzzle IV: at most one scout per segment
+def independence(board, is_scout):
+    yield from lakes(board, is_scout)
+    for constraints, (_, two) in counted(board, is_scout, 2):
+        yield constraints + [ Not(two) ]
+
+# Puzzle III: each square is on a segment with a scout
+def domination(board, is_scout):
+    yield from lakes(board, is_scout)
+    occupied = []
+    for constraints, (one, ) in counted(board, is_scout, 1):
+        occupied.append(one)
+        yield constraints
+    for r, c, row, col in lines(board):
+        yield [ Or(occupied[row], occupied[col]) ]
+
+# Puzzle V: at most two scouts per segment, and each scout shares exactly one of its segments with another scout
+def cover(board, is_scout):
+    yield from lakes(board, is_scout)
+    paired = []
+    for constraints, (_, two, three) in counted(board, is_scout, 3):
+        paired.append(two)
+        yield constraints + [ Not(three) ]
+    for r, c, row, col in lines(board):
+        yield [ Implies(is_scout[r][c], Xor(paired[row], paired[col])) ]
+
+# Puzzle VI: the pieces on each square, and a bomb budget in each setup area that grows with its area (6 bombs on the
+# 40 squares of the Stratego setup area)
+def budget(board):
+    return 6 * popcount(board.red_setup) // 40
+
+def placement(board, is_scout, is_bomb):
+    yield [ Not(Or(is_scout[r][c], is_bomb[r][c])) for (r, c) in board.lake_squares() ]
+    yield [ Not(And(is_scout[r][c], is_bomb[r][c])) for (r, c) in board.open_squares() ]
+    yield [ Not(is_bomb[r][c]) for (r, c) in board.squares_of(board.dmz) ]
+    for setup in (board.red_setup, board.blu_setup):
+        yield at_most([ is_bomb[r][c] for (r, c) in board.squares_of(setup) ], budget(board))
+
+# Puzzle VI: no scout threatens another scout unless a bomb is in between. The visibility of the scouts is chained along each
+# segment, as in the chained encoding of scout_bomb_independence.py: visible[i] == a scout before the i-th square is not blocked.
+def bomb_independence(board, is_scout):
+    is_bomb = grid(board, 'is_bomb')
+    yield from placement(board, is_scout, is_bomb)
+    for k, segment in enumerate(board.segments):
+        visible = [ BoolVal(False) ] + [ Bool("visible_%s_%s" % (k, i)) for i in range(1, len(segment)) ]
+        constraints = []
+        for i, (r, c) in enumerate(segment):
+            constraints.append(Implies(is_scout[r][c], Not(visible[i])))
+            if i + 1 < len(segment):
+                constraints.append(Implies(Or(is_scout[r][c], And(visible[i], Not(is_bomb[r][c]))), visible[i + 1]))
+        yield constraints
+
+# The constraints of the scripts, for comparison: a single list with the squares of both segments in each constraint
+def dense(family):
+    def build(board, is_scout):
+        moves = lambda r, c: [ is_scout[dr][dc] for (dr, dc) in board.scout_moves_from[r][c] ]
+        if family == 'bomb_independence':
+            is_bomb = grid(board, 'is_bomb')
+            blocked = lambda r, c, rt, ct: Or([ is_bomb[rb][cb] for (rb, cb) in board.squares_of(board.between[board.square(r, c), board.square(rt, ct)]) ])
+            yield [ x for chunk in placement(board, is_scout, is_bomb) for x in chunk ] + [
+                Implies(is_scout[r][c], And([ Implies(is_scout[rt][ct], blocked(r, c, rt, ct)) for (rt, ct) in board.scout_moves_from[r][c] ]))
+                for (r, c) in board.open_squares()
+            ]
+            return
+        constraints = [ Not(is_scout[r][c]) for (r, c) in board.lake_squares() ]
+        if family == 'independence':
+            constraints += [ Implies(is_scout[r][c], And([ Not(x) for x in moves(r, c) ])) for (r, c) in board.open_squares() ]
+        elif family == 'domination':
+            constraints += [ Or(is_scout[r][c], Or(moves(r, c))) for (r, c) in board.open_squares() ]
+        else:
+            constraints += [ x for s in board.segments for x in at_most([ is_scout[r][c] for (r, c) in s ], 2) ]
+            constraints += [ Implies(is_scout[r][c], And(exactly(moves(r, c), 1))) for (r, c) in board.open_squares() ]
+        yield constraints
+    return build
+
+families = {
+    'independence':      independence,
+    'domination':        domination,
+    'cover':             cover,
+    'bomb_independence': bomb_independence
+}
+
+# Square boards of size 10 * k, with the lakes of the Stratego board scaled by k, or random lakes with the given density
+def generalized(k, density=None, seed=0):
+    if density is None:
+        return scaled(k)
+    return random_lakes(10 * k, 10 * k, density, seed, 4 * k)
+
+# Stream the constraints of a family into a fresh solver
+def build(board, family, streamed=True):
+    s = SolverFor("QF_FD")
+    is_scout = grid(board, 'is_scout')
+    constraints = 0
+    for chunk in (families[family] if streamed else dense(family))(board, is_scout):
+        s.add(chunk)
+        constraints += len(chunk)
+    return s, is_scout, constraints
+
+def measure(task):
+    k, density, seed, family, streamed, check = task
+    board = generalized(k, density, seed)
+    memory, start = Z3_get_estimated_alloc_size(), time.perf_counter()
+    s, _, constraints = build(board, family, streamed)
+    elapsed, memory = time.perf_counter() - start, Z3_get_estimated_alloc_size() - memory
+    verdict = str(s.check()) if check else ''
+    return board.H, board.W, len(board.squares), family, streamed, constraints, elapsed, memory, verdict
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the construction of the scout puzzle models on larger boards, streamed with shared segment counts against the constraints of the scripts.")
+    parser.add_argument('families', nargs='*', default=list(families), help="puzzle families to build (default: all)")
+    parser.add_argument('--scale', type=int, nargs='*', default=[ 1, 2, 4 ], help="build boards of size 10 times these factors")
+    parser.add_argument('--density', type=float, default=None, help="random lakes with this density, instead of the scaled Stratego lakes")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the lakes")
+    parser.add_argument('--dense', action='store_true', help="also build the constraints of the scripts, for comparison")
+    parser.add_argument('--check', action='store_true', help="also check the satisfiability of each model")
+    args = parser.parse_args()
+
+    # Each model is built in a fresh process, so that the terms of earlier models do not count
+    tasks = [
+        (k, args.density, args.seed, family, streamed, args.check)
+        for family in args.families
+        for k in args.scale
+        for streamed in ([ True, False ] if args.dense else [ True ])
+    ]
+    print("%-8s%-20s%-10s%12s%10s%10s%12s%12s%8s" % ('board', 'family', 'builder', 'constraints', 'seconds', 'MB', 'us/square', 'KB/square', 'check'))
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for H, W, n, family, streamed, constraints, elapsed, memory, verdict in pool.imap(measure, tasks):
+            print("%-8s%-20s%-10s%12s%10.3f%10.1f%12.1f%12.2f%8s" % (
+                "%sx%s" % (H, W), family, 'streamed' if streamed else 'dense', constraints, elapsed, memory / 2**20, 1e6 * elapsed / n, memory / 2**10 / n, verdict
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+import hashlib
+import json
+import os
+
+# Version of the layout of the cache entries, part of every key
+version = 1
+
+# On-disk cache of solver results, one JSON file per problem, named after the canonical hash of the problem.
+# Optionally, the SAT core writes a DRAT proof of its search next to the entry.
+class Cache:
+    def __init__(self, path, proofs=False):
+        self.path, self.proofs = path, proofs
+        os.makedirs(path, exist_ok=True)
+
+    # The canonical constraint set of a problem is the sorted list of the assertions of its solver. It captures the board
+    # geometry, the lakes and the piece budgets, as well as the encodings, so that any change to an encoding gives a new key.
+    # The question is what is asked about the constraints: the goal of an optimization, or a target number of pieces.
+    def key(self, s, question):
+        assertions = sorted(a.sexpr() for a in s.assertions())
+        return hashlib.sha256(json.dumps([ version, question, assertions ]).encode()).hexdigest()
+
+    def file(self, key, extension='json'):
+        return os.path.join(self.path, "%s.%s" % (key, extension))
+
+    # The proof of the current process, until its result is stored
+    def scratch(self):
+        return os.path.join(self.path, "%s.drat.tmp" % os.getpid())
+
+    # Z3 parameters that have to be set before the solver is created
+    def params(self):
+        return [ ('sat.drat.file', self.scratch()) ] if self.proofs else []
+
+    def discard(self):
+        if os.path.exists(self.scratch()):
+            os.remove(self.scratch())
+
+    def load(self, key):
+        if not os.path.exists(self.file(key)):
+            return None
+        with open(self.file(key)) as f:
+            return json.load(f)
+
+    # Only definitive answers are stored. The entry is written to a temporary file first, so that a concurrent reader
+    # never sees a partial entry.
+    def store(self, key, question, result, statistics):
+        if result.verdict == 'unknown':
+            self.discard()
+            return
+        proof = None
+        if self.proofs and os.path.exists(self.scratch()) and os.path.getsize(self.scratch()) > 0:
+            proof = os.path.basename(self.file(key, 'drat'))
+            os.replace(self.scratch(), self.file(key, 'drat'))
+        entry = { 'question': question, 'verdict': result.verdict, 'value': result.value, 'pieces': result.pieces, 'statistics': statistics, 'proof': proof }
+        scratch = self.file(key, "json.%s.tmp" % os.getpid())
+        with open(scratch, 'w') as f:
+            json.dump(entry, f)
+        os.replace(scratch, self.file(key))
+
+def main():
+    parser = argparse.ArgumentParser(description="List the entries of a result cache.")
+    parser.add_argument('path', help="cache directory")
+    args = parser.parse_args()
+
+    for name in sorted(os.listdir(args.path)):
+        if name.endswith('.json'):
+            with open(os.path.join(args.path, name)) as f:
+                entry = json.load(f)
+            print("%s %-20s %-7s %4s %s" % (name[:16], entry['question'], entry['verdict'], entry['value'], entry['proof'] or ''))
+
+if __name__ == '__main__':
+    main()
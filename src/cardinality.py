@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from itertools import product
+import multiprocessing
+from z3 import Bool, BoolVal, FreshBool, If, is_false, Not, Or, PbEq, PbGe, PbLe, sat, Solver, Sum
+
+# Cardinality constraints on a list of literals, emitted natively as pseudo-Boolean constraints, as integer arithmetic,
+# or in pure CNF as a sequential counter, a totalizer or an odd-even merge sorting network.
+encodings = [ 'native', 'arith', 'sequential', 'totalizer', 'sorting' ]
+
+# Sequential counter (Sinz 2005): s[i][j] is forced true if at least j + 1 of the first i + 1 literals are true
+def sequential(literals, k):
+    n = len(literals)
+    if k >= n:
+        return []
+    if k == 0:
+        return [ Not(x) for x in literals ]
+    s = [ [ FreshBool('seq') for _ in range(k) ] for _ in range(n - 1) ]
+    clauses = [ Or(Not(literals[0]), s[0][0]) ] + [ Not(s[0][j]) for j in range(1, k) ]
+    for i in range(1, n - 1):
+        x = literals[i]
+        clauses += [ Or(Not(x), s[i][0]), Or(Not(s[i - 1][0]), s[i][0]) ]
+        for j in range(1, k):
+            clauses += [ Or(Not(x), Not(s[i - 1][j - 1]), s[i][j]), Or(Not(s[i - 1][j]), s[i][j]) ]
+        clauses.append(Or(Not(x), Not(s[i - 1][k - 1])))
+    clauses.append(Or(Not(literals[n - 1]), Not(s[n - 2][k - 1])))
+    return clauses
+
+# Totalizer (Bailleux and Boufkhad 2003): unary outputs r[i] == at least i + 1 of the literals are true
+def totalizer(literals):
+    if len(literals) <= 1:
+        return [], list(literals)
+    mid = len(literals) // 2
+    left, a = totalizer(literals[:mid])
+    right, b = totalizer(literals[mid:])
+    r = [ FreshBool('tot') for _ in range(len(a) + len(b)) ]
+    clauses = left + right
+    for i in range(len(a) + 1):
+        for j in range(len(b) + 1):
+            # a[i - 1] and b[j - 1] imply r[i + j - 1]; not a[i] and not b[j] imply not r[i + j]
+            if i + j > 0:
+                clauses.append(Or([ Not(x) for x in ([ a[i - 1] ] if i else []) + ([ b[j - 1] ] if j else []) ] + [ r[i + j - 1] ]))
+            if i + j < len(r):
+                clauses.append(Or(([ a[i] ] if i < len(a) else []) + ([ b[j] ] if j < len(b) else []) + [ Not(r[i + j]) ]))
+    return clauses, r
+
+# Comparator of a sorting network, with the larger output first. Constant inputs (from padding) are propagated.
+def comparator(a, b, clauses):
+    if is_false(b):
+        return a, b
+    if is_false(a):
+        return b, a
+    hi, lo = FreshBool('cmp'), FreshBool('cmp')
+    clauses += [
+        Or(Not(a), hi), Or(Not(b), hi), Or(Not(hi), a, b),
+        Or(Not(a), Not(b), lo), Or(Not(lo), a), Or(Not(lo), b)
+    ]
+    return hi, lo
+
+# Batcher's odd-even merge sort on a power-of-two number of inputs: outputs r[i] == at least i + 1 of the literals are true
+def sorting(literals):
+    n = 1
+    while n < len(literals):
+        n *= 2
+    x = list(literals) + [ BoolVal(False) ] * (n - len(literals))
+    clauses = []
+
+    def merge(lo, hi, r):
+        step = r * 2
+        if step < hi - lo:
+            merge(lo, hi, step)
+            merge(lo + r, hi, step)
+            for i in range(lo + r, hi - r, step):
+                x[i], x[i + r] = comparator(x[i], x[i + r], clauses)
+        else:
+            x[lo], x[lo + r] = comparator(x[lo], x[lo + r], clauses)
+
+    def sort(lo, hi):
+        if hi > lo:
+            mid = (lo + hi) // 2
+            sort(lo, mid)
+            sort(mid + 1, hi)
+            merge(lo, hi, 1)
+
+    sort(0, n - 1)
+    return clauses, x[:len(literals)]
+
+def unary(literals, encoding):
+    return totalizer(literals) if encoding == 'totalizer' else sorting(literals)
+
+# Bounds outside 0 to the number of literals are trivial or infeasible, whatever the encoding, and need no clauses
+def at_most(literals, k, encoding='native'):
+    literals = list(literals)
+    if k < 0:
+        return [ BoolVal(False) ]
+    if k >= len(literals):
+        return []
+    if encoding == 'native':
+        return [ PbLe([ (x, 1) for x in literals ], k) ]
+    if encoding == 'arith':
+        return [ Sum([ If(x, 1, 0) for x in literals ]) <= k ]
+    if encoding == 'sequential':
+        return sequential(literals, k)
+    clauses, r = unary(literals, encoding)
+    return clauses + [ Not(r[k]) ]
+
+def at_least(literals, k, encoding='native'):
+    literals = list(literals)
+    if k <= 0:
+        return []
+    if k > len(literals):
+        return [ BoolVal(False) ]
+    if encoding == 'native':
+        return [ PbGe([ (x, 1) for x in literals ], k) ]
+    if encoding == 'arith':
+        return [ Sum([ If(x, 1, 0) for x in literals ]) >= k ]
+    if k == 1:
+        return [ Or(literals) ]
+    if encoding == 'sequential':
+        return sequential([ Not(x) for x in literals ], len(literals) - k)
+    clauses, r = unary(literals, encoding)
+    return clauses + [ r[k - 1] ]
+
+def exactly(literals, k, encoding='native'):
+    literals = list(literals)
+    if k < 0 or k > len(literals):
+        return [ BoolVal(False) ]
+    if not literals:
+        return []
+    if encoding == 'native':
+        return [ PbEq([ (x, 1) for x in literals ], k) ]
+    if encoding == 'arith':
+        return [ Sum([ If(x, 1, 0) for x in literals ]) == k ]
+    if encoding == 'sequential':
+        return at_most(literals, k, encoding) + at_least(literals, k, encoding)
+    clauses, r = unary(literals, encoding)
+    return clauses + ([ r[k - 1] ] if k > 0 else []) + ([ Not(r[k]) ] if k < len(r) else [])
+
+# Check each encoding against the truth table: for up to n literals, every bound from -1 to n + 1 and every assignment of the
+# literals, the constraint is satisfiable exactly when the count of true literals satisfies it. Returns the failed cases.
+def selfcheck(n=6):
+    relations = { at_most: lambda m, k: m <= k, at_least: lambda m, k: m >= k, exactly: lambda m, k: m == k }
+    failures = []
+    for encoding in encodings:
+        for size in range(n + 1):
+            literals = [ Bool("x_%s" % i) for i in range(size) ]
+            for constraint, holds in relations.items():
+                for k in range(-1, size + 2):
+                    s = Solver()
+                    s.add(constraint(literals, k, encoding))
+                    for assignment in product((False, True), repeat=size):
+                        feasible = s.check([ x if v else Not(x) for x, v in zip(literals, assignment) ]) == sat
+                        if feasible != holds(sum(assignment), k):
+                            failures.append((encoding, constraint.__name__, size, k, assignment))
+    return failures
+
+def main():
+    from portfolio import run
+    from puzzle import puzzles
+
+    parser = argparse.ArgumentParser(description="Benchmark the cardinality constraint encodings on the puzzles.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to benchmark (default: all)")
+    parser.add_argument('--encodings', nargs='+', choices=encodings, default=encodings)
+    parser.add_argument('--timeout', type=float, default=60, help="time limit per solver call in seconds")
+    parser.add_argument('--check', action='store_true', help="check the encodings against the truth table instead, for up to 6 literals")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = selfcheck()
+        for encoding, name, size, k, assignment in failures:
+            print("%s %s(%s literals, %s) is wrong for %s" % (encoding, name, size, k, assignment))
+        print("All encodings agree with the truth table." if not failures else "%s failures." % len(failures))
+        raise SystemExit(1 if failures else 0)
+
+    # Each run gets a fresh process, since the terms that earlier runs leave behind in Z3 change the search of later runs
+    print("%-6s" % 'puzzle' + ''.join("%14s" % e for e in args.encodings))
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for puzzle in args.puzzles:
+            module, kwargs = puzzles[puzzle]
+            configs = [
+                (module, dict(kwargs, cardinality=encoding, params=[ ('timeout', int(1000 * args.timeout)) ]))
+                for encoding in args.encodings
+            ]
+            print("%-6s" % puzzle + ''.join(
+                "%14s" % ("%.2f (%s)" % (elapsed, result.value if result.verdict == 'sat' else '?'))
+                for _, result, elapsed in pool.imap(run, configs)
+            ))
+
+if __name__ == '__main__':
+    main()
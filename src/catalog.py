@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+from geometry import setup_area, stratego
+
+# The six puzzles, as the script that models them and the keyword arguments of its solve() function
+puzzles = {
+    'I':   ('bomb_domination', { 'windows': [ (2, 3), (3, 2) ] }),
+    'II':  ('bomb_domination', { 'windows': [ (2, 3), (3, 2), (1, 6) ] }),
+    'III': ('scout_domination', {}),
+    'IV':  ('scout_independence', {}),
+    'V':   ('scout_cover', {}),
+    'VI':  ('scout_bomb_independence', {})
+}
+
+# The board of each puzzle
+boards = { 'I': setup_area, 'II': setup_area, 'III': stratego, 'IV': stratego, 'V': stratego, 'VI': stratego }
+
+# Symbols of the pieces in the diagrams, next to '.' for an empty square and '#' for a lake
+symbols = { 'scouts': '2', 'bombs': 'B' }
+
+# Board display of the pieces
+def diagram(board, pieces):
+    return board.diagram(lambda r, c: next((
+        symbols[name]
+        for name, b in pieces.items()
+        if b >> board.square(r, c) & 1
+    ), '.'))
+
+# Read a diagram, as printed by the scripts or shown in the README, back into bitboards. Other lines (such as a title) are skipped.
+def parse(board, text):
+    legal = set(symbols.values()) | { '#', '.' }
+    rows = [ line.split() for line in text.splitlines() if len(line.split()) == board.W and set(line.split()) <= legal ]
+    if len(rows) != board.H:
+        raise ValueError("expected a diagram of %s rows of %s squares, found %s rows" % (board.H, board.W, len(rows)))
+    return {
+        name: sum(1 << board.square(r, c) for r, row in enumerate(rows) for c, x in enumerate(row) if x == symbol)
+        for name, symbol in symbols.items()
+    }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from collections import namedtuple
+from functools import partial
+from importlib import import_module
+from inspect import signature
+import json
+import multiprocessing
+import os
+import time
+from z3 import And, Bool, get_version_string, Implies, Not, Or, SolverFor, unsat
+
+from cardinality import at_least, at_most, exactly
+from catalog import puzzles
+from geometry import bit, popcount, stratego
+from puzzle import configure, optimize, puzzle_of, variables
+
+# Cuts from UNSAT cores: the constraints of a puzzle are split into groups that each concern a sub-board (a segment, a square
+# and its threats, a setup area), and each group is switched on by an assumption literal. For a region of the board, a solver
+# with only the groups that touch the region is a relaxation of the puzzle, whose maximum number of scouts in the region is
+# therefore an upper bound on the scouts in that region of any solution. Its UNSAT core, minimized by deletion, shows which
+# groups the bound rests on. The bounds are added to the full model as cuts, which spares the search from rediscovering them
+# in every branch of a disproof.
+Cut = namedtuple('Cut', ['region', 'squares', 'bound', 'core'])
+
+# Cuts that cores.py derived for each puzzle, stored as JSON next to the scripts
+directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cuts')
+
+# Open squares of a set of rows or columns
+def rows(board, first, last):
+    return board.open & sum(bit(board.square(r, c)) for r in range(first, last + 1) for c in range(board.W))
+
+def columns(board, first, last):
+    return board.open & sum(bit(board.square(r, c)) for r in range(board.H) for c in range(first, last + 1))
+
+# Sub-boards: the setup areas, the DMZ, the halves of the board, each setup area together with the DMZ, and strips of two columns,
+# which are split by the lakes in the columns 2-3 and 6-7
+def regions(board):
+    return dict([
+        ('red setup',  board.red_setup),
+        ('blue setup', board.blu_setup),
+        ('dmz',        board.dmz),
+        ('red half',   rows(board, 0, board.H // 2 - 1)),
+        ('blue half',  rows(board, board.H // 2, board.H - 1)),
+        ('red side',   board.red_setup | board.dmz),
+        ('blue side',  board.blu_setup | board.dmz)
+    ] + [
+        ("columns %s-%s" % (c, c + 1), columns(board, c, c + 1)) for c in range(0, board.W, 2)
+    ])
+
+# Groups of constraints of puzzle V: at most two scouts per segment, and each scout threatens exactly one other scout
+def scout_cover(grids, **_):
+    is_scout = grids['scouts']
+    return [
+        ("segment %s" % k, m, at_most([ is_scout[r][c] for (r, c) in s ], 2))
+        for k, (s, m) in enumerate(zip(stratego.segments, stratego.segment_masks))
+    ] + [
+        ("square %s" % stratego.square(r, c), bit(stratego.square(r, c)) | stratego.attacks[stratego.square(r, c)], [
+            Implies(is_scout[r][c], And(exactly([ is_scout[dr][dc] for (dr, dc) in stratego.scout_moves_from[r][c] ], 1)))
+        ])
+        for (r, c) in stratego.open_squares()
+    ] + [
+        ('lakes', stratego.lakes, [ Not(is_scout[r][c]) for (r, c) in stratego.lake_squares() ])
+    ]
+
+# Groups of constraints of puzzle VI: the bomb budget of each setup area, and along each segment the threats (pairwise, together
+# with the bound of one more scout than bombs) and the placement of the pieces on its squares
+def scout_bomb_independence(grids, budget=6):
+    is_scout, is_bomb = grids['scouts'], grids['bombs']
+    red, blue = budget if isinstance(budget, (tuple, list)) else (budget, budget)
+    return [
+        ('red budget', stratego.red_setup, at_most([ is_bomb[r][c] for (r, c) in stratego.squares_of(stratego.red_setup) ], red)),
+        ('blue budget', stratego.blu_setup, at_most([ is_bomb[r][c] for (r, c) in stratego.squares_of(stratego.blu_setup) ], blue)),
+        ('lakes', stratego.lakes, [ Not(Or(is_scout[r][c], is_bomb[r][c])) for (r, c) in stratego.lake_squares() ])
+    ] + [
+        ("segment %s" % k, m, [
+            Implies(
+                And(is_scout[ra][ca], is_scout[rb][cb]),
+                Or([ is_bomb[r][c] for (r, c) in stratego.squares_of(stratego.between[(stratego.square(ra, ca), stratego.square(rb, cb))]) ])
+            )
+            for i, (ra, ca) in enumerate(s)
+            for (rb, cb) in s[i + 1:]
+        ] + at_most([ is_scout[r][c] for (r, c) in s ] + [ Not(is_bomb[r][c]) for (r, c) in s ], len(s) + 1) + [
+            Not(And(is_scout[r][c], is_bomb[r][c])) for (r, c) in s
+        ] + [
+            Not(is_bomb[r][c]) for (r, c) in s if stratego.dmz >> stratego.square(r, c) & 1
+        ])
+        for k, (s, m) in enumerate(zip(stratego.segments, stratego.segment_masks))
+    ]
+
+groups = {
+    'scout_cover':             scout_cover,
+    'scout_bomb_independence': scout_bomb_independence
+}
+
+# Maximize the scouts of a region in the relaxation of the groups that touch it, and minimize the UNSAT core of one more scout
+def derive(module, region, squares, patience=1.0, timeout=None, **kwargs):
+    grids = { 'scouts': variables(stratego, 'is_scout'), 'bombs': variables(stratego, 'is_bomb') }
+    s, tracked = SolverFor('QF_FD'), {}
+    for name, footprint, constraints in groups[module](grids, **kwargs):
+        if footprint & squares:
+            tracked[name] = Bool("group_%s" % name.replace(' ', '_'))
+            s.add(Implies(tracked[name], And(constraints)))
+    literals = [ grids['scouts'][r][c] for (r, c) in stratego.squares_of(squares) ]
+    if timeout:
+        s.set('timeout', int(1000 * timeout))
+    verdict, m = optimize(s, literals, 'max', 0, len(literals), assumptions=list(tracked.values()))
+    if verdict != 'sat':
+        return None
+    bound = sum(1 for x in literals if m.evaluate(x, model_completion=True))
+
+    # Deletion-based minimization: drop each group in turn, and keep the smaller core of the check whenever it stays unsat.
+    # Without some groups, the disproof can take much longer than with all of them: a group whose check runs out of patience
+    # (in seconds) stays in the core, which is then still a core, but not necessarily a minimal one.
+    more = Bool("more_than_%s" % bound)
+    s.add(Implies(more, And(at_least(literals, bound + 1))))
+    if s.check(more, *tracked.values()) != unsat:
+        return None
+    core = [ name for name, g in tracked.items() if any(g.eq(c) for c in s.unsat_core()) ]
+    s.set('timeout', int(1000 * patience))
+    for name in list(core):
+        if name not in core:
+            continue
+        trial = [ n for n in core if n != name ]
+        if s.check(more, *[ tracked[n] for n in trial ]) == unsat:
+            core = [ n for n in trial if any(tracked[n].eq(c) for c in s.unsat_core()) ]
+    return Cut(region, squares, bound, core)
+
+# The cuts as constraints on the scouts of the full model
+def constraints(cuts, is_scout, cardinality='native'):
+    return [
+        constraint
+        for cut in cuts
+        for constraint in at_most([ is_scout[r][c] for (r, c) in stratego.squares_of(cut.squares) ], cut.bound, cardinality)
+    ]
+
+# The keyword arguments that the groups of a puzzle depend on, e.g. the bomb budget
+def settings(module, kwargs):
+    return { name: kwargs.get(name, p.default) for name, p in signature(groups[module]).parameters.items() if p.default is not p.empty }
+
+def store(puzzle, module, cuts, **kwargs):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "%s.json" % puzzle)
+    with open(path, 'w') as f:
+        json.dump({
+            'puzzle': puzzle,
+            'module': module,
+            'kwargs': settings(module, kwargs),
+            'cuts':   [ cut._asdict() for cut in cuts ],
+            'z3':     get_version_string()
+        }, f, indent=4)
+    return path
+
+# The stored cuts of the puzzle that a script solves, if they were derived with the same keyword arguments (e.g. the budget)
+def load(module, kwargs):
+    name = puzzle_of(module, kwargs)
+    path = os.path.join(directory, "%s.json" % name)
+    if name is None or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        stored = json.load(f)
+    if json.dumps(settings(module, kwargs)) != json.dumps(stored['kwargs']):
+        return []
+    return [ Cut(**cut) for cut in stored['cuts'] ]
+
+# Time the disproof of a target number of scouts, with or without the cuts
+def disprove(module, target, cuts=(), **kwargs):
+    s, grids = import_module(module).model(**kwargs)
+    s.add(constraints(cuts, grids['scouts']))
+    s.add(at_least([ grids['scouts'][r][c] for (r, c) in stratego.board() ], target))
+    start = time.perf_counter()
+    result = s.check()
+    return str(result), time.perf_counter() - start
+
+# Each derivation and disproof runs in a fresh process, since the search times of Z3 depend on the terms created before
+def run(task):
+    seed, job, args = task
+    configure(seed)
+    start = time.perf_counter()
+    return job(*args), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive cuts for the scout puzzles from the minimized UNSAT cores of relaxations on sub-boards, and store them for the scripts.")
+    parser.add_argument('puzzles', nargs='*', default=[ name for name, (module, _) in puzzles.items() if module in groups ], help="puzzles to derive cuts for (default: V and VI)")
+    parser.add_argument('--target', type=int, nargs='*', default=None, help="time the disproof of these numbers of scouts with and without the cuts")
+    parser.add_argument('--timeout', type=float, default=60, metavar='SECONDS', help="time limit of the maximization in each region, which gives no cut when it runs out")
+    parser.add_argument('--patience', type=float, default=1.0, metavar='SECONDS', help="time limit of each check of the core minimization")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the SAT core")
+    parser.add_argument('--dry-run', action='store_true', help="report the cuts without storing them")
+    args = parser.parse_args()
+
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for puzzle in args.puzzles:
+            module, kwargs = puzzles[puzzle]
+            if module not in groups:
+                parser.error("no constraint groups for puzzle %s (%s)" % (puzzle, module))
+            print("Puzzle %s (%s)" % (puzzle, module))
+            cuts = []
+            tasks = [ (args.seed, partial(derive, **kwargs), (module, region, squares, args.patience, args.timeout)) for region, squares in regions(stratego).items() ]
+            for (region, squares), (cut, seconds) in zip(regions(stratego).items(), pool.imap(run, tasks)):
+                if cut is None:
+                    print("    %-12s %2s squares: no cut within %s seconds" % (region, popcount(squares), args.timeout), flush=True)
+                    continue
+                print("    %-12s %2s squares: at most %2s scouts (%5.2f seconds, core of %s groups)" % (region, popcount(squares), cut.bound, seconds, len(cut.core)), flush=True)
+                cuts.append(cut)
+            if not args.dry_run:
+                print("    Stored in %s" % store(puzzle, module, cuts, **kwargs))
+            for target in args.target or []:
+                for name, chosen in (('without', []), ('with', cuts)):
+                    (verdict, _), seconds = pool.apply(run, ((args.seed, disprove, (module, target, chosen)), ))
+                    print("    N >= %s %s cuts: %s (%.2f seconds)" % (target, name, verdict, seconds), flush=True)
+
+if __name__ == '__main__':
+    main()
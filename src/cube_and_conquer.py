@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from itertools import product
+import json
+import multiprocessing
+import os
+import time
+from z3 import sat
+
+from cardinality import encodings, exactly
+from catalog import diagram
+from geometry import stratego
+from puzzle import configure, Log, pieces
+import scout_bomb_independence as puzzle
+
+H, W = stratego.H, stratego.W
+
+# The rows of a setup area, from the row segments that lie in it
+def rows(area):
+    return sorted({ r for m in stratego.row_masks if m & area for (r, _) in stratego.squares_of(m) })
+
+# Regions of the setup areas on whose number of bombs the search is split, labeled by their setup area.
+# At depth 1 these are the two setup areas, at depth 2 their front and back halves.
+def regions(depth):
+    parts = [
+        (side, part)
+        for side, area in (('red', stratego.red_setup), ('blu', stratego.blu_setup))
+        for part in ([ rows(area) ] if depth == 1 else [ rows(area)[:len(rows(area)) // 2], rows(area)[len(rows(area)) // 2:] ])
+    ]
+    return [ (side, [ (r, c) for r in part for c in range(W) ]) for side, part in parts ]
+
+# Cubes assign a number of bombs to each region, within the bomb budget of each setup area.
+# More bombs leave room for more scouts, so the cubes with the most bombs come first.
+def cubes(depth, budget=6):
+    labels = [ label for (label, _) in regions(depth) ]
+    limits = dict(zip(('red', 'blu'), puzzle.budgets(budget)))
+    return sorted((
+        values
+        for values in product(range(max(limits.values()) + 1), repeat=len(labels))
+        if all(sum(v for (l, v) in zip(labels, values) if l == side) <= limit for side, limit in limits.items())
+    ), key=lambda values: -sum(values))
+
+def conquer(task):
+    scouts, depth, cube, options = task
+    start = time.perf_counter()
+    configure(options.get('seed', 0), options.get('params', ()))
+    s, grids = puzzle.model(**{ key: value for key, value in options.items() if key not in ('seed', 'params') })
+    is_scout, is_bomb = grids['scouts'], grids['bombs']
+    encoding = options.get('cardinality', 'native')
+    s.add(exactly([ is_scout[r][c] for (r, c) in stratego.board() ], scouts, encoding))
+    for (_, squares), value in zip(regions(depth), cube):
+        s.add(exactly([ is_bomb[r][c] for (r, c) in squares ], value, encoding))
+    result = s.check()
+    p = pieces(stratego, s.model(), grids) if result == sat else {}
+    return cube, str(result), p, time.perf_counter() - start
+
+# The checkpoint starts with the settings of its run, and a run with other settings (such as the number of scouts, the budget
+# or the encodings) refuses to resume from it, since its cubes would have other verdicts
+def load(checkpoint, settings):
+    if not os.path.exists(checkpoint) or os.path.getsize(checkpoint) == 0:
+        with open(checkpoint, 'w') as f:
+            f.write(json.dumps({ 'settings': settings }, sort_keys=True) + '\n')
+        return {}
+    with open(checkpoint) as f:
+        header, entries = json.loads(next(f)), list(map(json.loads, f))
+    if json.dumps(header.get('settings'), sort_keys=True) != json.dumps(settings, sort_keys=True):
+        raise ValueError("checkpoint %s was written with the settings %s, not %s" % (checkpoint, json.dumps(header.get('settings')), json.dumps(settings)))
+    return { tuple(entry['cube']): entry for entry in entries }
+
+# Solve all cubes that are not in the checkpoint yet in a process pool, appending each finished cube to the checkpoint.
+# Returns 'sat' with a witness as soon as one cube is satisfiable, 'unsat' if all cubes are unsatisfiable, and 'unknown' otherwise.
+def cube_and_conquer(scouts, depth=1, jobs=None, checkpoint=None, log=None, budget=6, **options):
+    all_cubes = cubes(depth, budget)
+    options = dict(options, budget=budget)
+    settings = dict(options, scouts=scouts, depth=depth, budget=list(puzzle.budgets(budget)))
+    done = load(checkpoint, settings) if checkpoint else {}
+    for entry in done.values():
+        if entry['verdict'] == 'sat':
+            return 'sat', entry['pieces']
+    todo = [ cube for cube in all_cubes if cube not in done ]
+    if log:
+        log('resume', done=len(all_cubes) - len(todo), cubes=len(all_cubes))
+
+    num_unknown = 0
+    with multiprocessing.Pool(jobs) as pool, open(checkpoint or os.devnull, 'a') as f:
+        for cube, verdict, p, elapsed in pool.imap_unordered(conquer, [ (scouts, depth, cube, options) for cube in todo ]):
+            if verdict != 'unknown':
+                f.write(json.dumps({ 'cube': cube, 'verdict': verdict, 'pieces': p, 'seconds': elapsed }) + '\n')
+                f.flush()
+                done[cube] = verdict
+            else:
+                num_unknown += 1
+            if log:
+                log('cube', done=len(done), cubes=len(all_cubes), cube=list(cube), verdict=verdict, seconds=elapsed)
+            if verdict == 'sat':
+                return 'sat', p
+    return ('unsat', {}) if num_unknown == 0 else ('unknown', {})
+
+def main():
+    parser = argparse.ArgumentParser(description="Cube-and-conquer for puzzle VI: split on the number of bombs in (parts of) the setup areas, and solve the cubes in parallel.")
+    parser.add_argument('--scouts', type=int, default=25, help="number of scouts to place (24 is feasible, 25 is not)")
+    parser.add_argument('--depth', type=int, choices=[ 1, 2 ], default=1, help="split on the setup areas (1) or on their halves (2)")
+    parser.add_argument('--jobs', type=int, default=None, help="number of worker processes (default: number of cores)")
+    parser.add_argument('--checkpoint', default=None, help="file with the finished cubes (default: scout_bomb_independence-<scouts>-<depth>.checkpoint)")
+    parser.add_argument('--encoding', choices=list(puzzle.encodings), default='chained', help="encoding of the scout threats along each segment")
+    parser.add_argument('--cardinality', choices=encodings, default='native', help="encoding of the cardinality constraints")
+    parser.add_argument('--budget', type=int, nargs='+', default=[ 6 ], metavar='BOMBS', help="bombs per setup area, or for the red and the blue setup area")
+    parser.add_argument('--log', default=None, metavar='FILE', help="also append the progress of the cubes as JSON lines to this file")
+    args = parser.parse_args()
+    if len(args.budget) > 2:
+        parser.error("--budget takes one or two numbers of bombs")
+    budget = args.budget[0] if len(args.budget) == 1 or args.budget[0] == args.budget[1] else tuple(args.budget)
+
+    checkpoint = args.checkpoint or "scout_bomb_independence-%s-%s.checkpoint" % (args.scouts, args.depth)
+    print(puzzle.title(budget))
+    # The progress of the cubes is the output of the script, and is always shown
+    try:
+        verdict, p = cube_and_conquer(args.scouts, args.depth, args.jobs, checkpoint, Log(args.log), budget, encoding=args.encoding, cardinality=args.cardinality)
+    except ValueError as e:
+        parser.error(str(e))
+    if verdict == 'sat':
+        print("Feasible number of scouts satisfying constraints == %s." % args.scouts)
+        print(diagram(stratego, p))
+    elif verdict == 'unsat':
+        print("No placement of %s scouts satisfies the constraints." % args.scouts)
+    else:
+        print("Z3 failed to find a solution.")
+
+if __name__ == '__main__':
+    main()
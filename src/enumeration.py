@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from importlib import import_module
+from itertools import combinations, product
+import time
+from z3 import Not, Or, PbEq, sat, SolverFor
+
+from builder import families, grid
+from catalog import diagram, puzzles
+from geometry import Board, bits, popcount, random_lakes
+from kernel import dominated
+from puzzle import configure, packed, pieces
+from symmetry import image, reflections, symmetries
+from verify import verified
+
+# Blocking clause that excludes exactly this placement of the pieces on the grids. Since the number of pieces on the
+# objective grid is fixed, any other placement has to leave one of its occupied squares empty.
+def block(board, grids, negations, p, objective):
+    return Or([
+        negations[name][r][c] if p[name] >> board.square(r, c) & 1 else grid[r][c]
+        for name, grid in grids.items()
+        for (r, c) in (board.squares_of(p[name]) if name == objective else board.open_squares())
+    ])
+
+# Stream the models of a solver as canonical representatives (the smallest bitboards among their reflections), together with
+# the size of their orbit under the board symmetries. Each model blocks its whole orbit at once, so that the incremental solver
+# only has to find one member of each orbit.
+def orbits(board, s, grids, objective):
+    names = sorted(grids)
+    negations = { name: [ [ Not(x) for x in row ] for row in grid ] for name, grid in grids.items() }
+    terms = { name: packed(grid) for name, grid in grids.items() }
+    perms = list(symmetries(board).values())
+    while s.check() == sat:
+        p = pieces(board, s.model(), grids, terms)
+        orbit = { tuple(p[name] for name in names) } | {
+            tuple(image(perm, p[name]) for name in names)
+            for perm in perms
+        }
+        for q in orbit:
+            s.add(block(board, grids, negations, dict(zip(names, q)), objective))
+        yield dict(zip(names, min(orbit))), len(orbit)
+
+# Stream the optimal solutions of a puzzle modulo the board symmetries, with the size of their orbits
+def solutions(puzzle, value=None, project=None, seed=0):
+    module, kwargs = puzzles[puzzle]
+    script = import_module(module)
+    if value is None:
+        value = script.solve(seed=seed, **kwargs).value
+
+    configure(seed)
+    s, grids = script.model(solver='fd', **kwargs)
+    board, objective = script.area, grids[script.objective]
+    s.add(PbEq([ (objective[r][c], 1) for (r, c) in board.board() ], value))
+
+    for p, size in orbits(board, s, { name: grids[name] for name in sorted(project or grids) }, script.objective):
+        assert project or verified(module, p, **kwargs)
+        yield p, size
+
+# Boards with random lakes, made symmetric under some of the reflections so that the orbits have different sizes
+def symmetric(H, W, density, seed):
+    boards = [ random_lakes(H, W, density, seed) ]
+    for name in ('H', 'V'):
+        board = boards[-1]
+        boards.append(Board(H, W, lakes=board.squares_of(board.lakes | image(reflections(board)[name], board.lakes))))
+    return boards
+
+# Compare the enumeration of the optimal independent and dominating sets of scouts with exhaustive search on small boards:
+# the number of solutions with the sum of the orbit sizes, and the number of orbits with Burnside's lemma, i.e. with the
+# average number of solutions that each symmetry (including the identity) leaves unchanged.
+def selfcheck(size=4, seeds=3, densities=(0.0, 0.2)):
+    feasible = {
+        'independence': lambda board, scouts: not any(board.attacks[sq] & scouts for sq in bits(scouts)),
+        'domination':   lambda board, scouts: not board.open & ~dominated(board, scouts)
+    }
+    failures = []
+    for H, W, density, seed in product(range(2, size + 1), range(2, size + 1), densities, range(seeds)):
+        for board in symmetric(H, W, density, seed):
+            perms = list(symmetries(board).values())
+            for family, holds in feasible.items():
+                found = [
+                    [ scouts for scouts in map(board.mask_of, combinations(bits(board.open), k)) if holds(board, scouts) ]
+                    for k in range(popcount(board.open) + 1)
+                ]
+                value = max(k for k in range(len(found)) if found[k]) if family == 'independence' else min(k for k in range(len(found)) if found[k])
+                expected = len(found[value]), sum(1 + sum(image(perm, scouts) == scouts for perm in perms) for scouts in found[value]) // (1 + len(perms))
+
+                s, is_scout = SolverFor("QF_FD"), grid(board, 'is_scout')
+                for chunk in families[family](board, is_scout):
+                    s.add(chunk)
+                s.add(PbEq([ (is_scout[r][c], 1) for (r, c) in board.board() ], value))
+                sizes = [ size for _, size in orbits(board, s, { 'scouts': is_scout }, 'scouts') ]
+                if (sum(sizes), len(sizes)) != expected:
+                    failures.append((family, H, W, board.lakes, (sum(sizes), len(sizes)), expected))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Enumerate all optimal solutions of one of the puzzles, modulo the reflections of the board.")
+    parser.add_argument('puzzle', nargs='?', choices=list(puzzles))
+    parser.add_argument('--value', type=int, default=None, help="number of pieces to place (default: the optimum)")
+    parser.add_argument('--project', nargs='+', default=None, metavar='GRID', help="only distinguish solutions by these grids, e.g. scouts")
+    parser.add_argument('--limit', type=int, default=None, help="stop after this many canonical solutions")
+    parser.add_argument('--show', action='store_true', help="print the diagram of each canonical solution")
+    parser.add_argument('--check', action='store_true', help="check the counts of the solutions and orbits against exhaustive search on small boards instead")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = selfcheck()
+        for family, H, W, lakes, found, expected in failures:
+            print("%s on a %sx%s board with lakes %s: %s solutions in %s orbits instead of %s in %s" % (family, H, W, hex(lakes), *found, *expected))
+        print("The enumeration agrees with exhaustive search." if not failures else "%s failures." % len(failures))
+        raise SystemExit(1 if failures else 0)
+    if args.puzzle is None:
+        parser.error("a puzzle is required")
+
+    module, _ = puzzles[args.puzzle]
+    board = import_module(module).area
+    num_orbits, num_solutions = 0, 0
+    start = time.perf_counter()
+    for p, size in solutions(args.puzzle, args.value, args.project):
+        num_orbits += 1
+        num_solutions += size
+        if args.show:
+            print("Solution %s (orbit of %s):" % (num_orbits, size))
+            print(diagram(board, p))
+        if num_orbits == args.limit:
+            break
+    elapsed = time.perf_counter() - start
+    print("Number of solutions == %s (%s modulo reflections), enumerated in %.2f seconds (%.0f solutions per second)." % (
+        num_solutions, num_orbits, elapsed, num_solutions / elapsed
+    ))
+
+if __name__ == '__main__':
+    main()
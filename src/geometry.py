@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+from functools import cached_property
+from itertools import chain, product
+import random
+
+# Bitboards are Python ints with bit r * W + c set for each occupied square (r, c)
+popcount = getattr(int, 'bit_count', lambda b: bin(b).count('1'))
+
+def bit(sq):
+    return 1 << sq
+
+def bits(b):
+    while b:
+        lsb = b & -b
+        yield lsb.bit_length() - 1
+        b ^= lsb
+
+# Scout moves in the left (L), right (R), downward (D) and upward (U) directions
+L, R, D, U = range(4)
+directions = { L: (0, -1), R: (0, +1), D: (-1, 0), U: (+1, 0) }
+
+class Board:
+    # A H x W board with impassable lakes and setup areas on the first and last `setup` rows
+    def __init__(self, H, W, lakes=(), setup=0):
+        self.H, self.W = H, W
+        self.squares = list(product(range(H), range(W)))
+        self.full = (1 << (H * W)) - 1
+        self.lakes = self.mask(lakes)
+        self.open = self.full & ~self.lakes
+        self.red_setup = self.mask(product(range(0, setup), range(W)))
+        self.blu_setup = self.mask(product(range(H - setup, H), range(W)))
+        self.dmz = self.open & ~(self.red_setup | self.blu_setup)
+
+        # Segments are the maximal horizontal and vertical runs of open squares
+        row_segments = [
+            [ (r, c) for c in range(c0, c1) ]
+            for r in range(H) for (c0, c1) in self.runs(lambda c: self.is_lake(r, c), W)
+        ]
+        col_segments = [
+            [ (r, c) for r in range(r0, r1) ]
+            for c in range(W) for (r0, r1) in self.runs(lambda r: self.is_lake(r, c), H)
+        ]
+        self.segments = row_segments + col_segments
+        self.segment_masks = [ self.mask(s) for s in self.segments ]
+        self.row_masks = self.segment_masks[:len(row_segments)]
+        self.col_masks = self.segment_masks[len(row_segments):]
+
+        # Each open square lies on exactly one row segment and one column segment
+        self.row_of, self.col_of = [ None ] * (H * W), [ None ] * (H * W)
+        for i, m in enumerate(self.row_masks):
+            for sq in bits(m):
+                self.row_of[sq] = i
+        for j, m in enumerate(self.col_masks):
+            for sq in bits(m):
+                self.col_of[sq] = j
+
+    # The tables of the scout moves grow faster than the area of the board (the squares between two squares of a ray even
+    # quadratically in its length), and are only built when they are first used, so that large boards stay cheap to set up
+
+    # Rays are ordered from the nearest to the farthest square a scout can move to
+    @cached_property
+    def rays(self):
+        return [ [ self.ray(sq, d) for sq in range(self.H * self.W) ] for d in directions ]
+
+    @cached_property
+    def ray_masks(self):
+        return [ [ self.mask_of(ray) for ray in rays ] for rays in self.rays ]
+
+    @cached_property
+    def attacks(self):
+        return [
+            self.ray_masks[L][sq] | self.ray_masks[R][sq] | self.ray_masks[D][sq] | self.ray_masks[U][sq]
+            for sq in range(self.H * self.W)
+        ]
+
+    @cached_property
+    def scout_moves_from(self):
+        return [ [ self.moves_from(r, c) for c in range(self.W) ] for r in range(self.H) ]
+
+    # Squares strictly between two squares that a scout can move between
+    @cached_property
+    def between(self):
+        return {
+            (sq, ray[i]): self.mask_of(ray[:i])
+            for d in directions
+            for sq, ray in enumerate(self.rays[d])
+            for i in range(len(ray))
+        }
+
+    def square(self, r, c):
+        return r * self.W + c
+
+    def coordinates(self, sq):
+        return divmod(sq, self.W)
+
+    def mask(self, squares):
+        return sum(bit(self.square(r, c)) for (r, c) in set(squares))
+
+    def mask_of(self, sqs):
+        return sum(bit(sq) for sq in set(sqs))
+
+    def squares_of(self, b):
+        return [ self.squares[sq] for sq in bits(b) ]
+
+    def is_lake(self, r, c):
+        return self.lakes >> self.square(r, c) & 1 == 1
+
+    def board(self):
+        return iter(self.squares)
+
+    def lake_squares(self):
+        return ((r, c) for (r, c) in self.squares if self.is_lake(r, c))
+
+    def open_squares(self):
+        return ((r, c) for (r, c) in self.squares if not self.is_lake(r, c))
+
+    def ray(self, sq, d):
+        (r, c), (dr, dc) = self.coordinates(sq), directions[d]
+        if self.is_lake(r, c):
+            return []
+        ray = []
+        r, c = r + dr, c + dc
+        while 0 <= r < self.H and 0 <= c < self.W and not self.is_lake(r, c):
+            ray.append(self.square(r, c))
+            r, c = r + dr, c + dc
+        return ray
+
+    def moves_from(self, r, c):
+        # Left, right, downward and upward moves, each in order of ascending rows and columns
+        sq = self.square(r, c)
+        return [
+            self.coordinates(t)
+            for t in chain(reversed(self.rays[L][sq]), self.rays[R][sq], reversed(self.rays[D][sq]), self.rays[U][sq])
+        ]
+
+    @staticmethod
+    def runs(is_blocked, n):
+        begin = 0
+        for i in range(n + 1):
+            if i == n or is_blocked(i):
+                if begin < i:
+                    yield begin, i
+                begin = i + 1
+
+    # Pairs of pieces on a common segment without a blocker between them, each pair once from its leftmost or lowest piece,
+    # together with the index of their segment
+    def threats(self, pieces, blockers=0):
+        pairs = []
+        for sq in bits(pieces):
+            for d, k in ((R, self.row_of[sq]), (U, len(self.row_masks) + self.col_of[sq])):
+                for t in self.rays[d][sq]:
+                    if blockers >> t & 1:
+                        break
+                    if pieces >> t & 1:
+                        pairs.append((k, sq, t))
+        return pairs
+
+    # Board display
+    def diagram(self, piece):
+        return '\n'.join(
+            ' '.join('#' if self.is_lake(r, c) else piece(r, c) for c in range(self.W))
+            for r in range(self.H)
+        )
+
+# Stratego board
+stratego = Board(10, 10, lakes=product(range(4, 6), chain(range(2, 4), range(6, 8))), setup=4)
+
+assert popcount(stratego.lakes) == 8
+assert popcount(stratego.dmz) == 12
+assert len(stratego.segments) == 28
+
+# Stratego setup area
+setup_area = Board(4, 10)
+
+# Stratego board scaled by an integer factor, with proportionally larger lakes and setup areas
+def scaled(k):
+    return Board(10 * k, 10 * k, lakes=product(range(4 * k, 6 * k), chain(range(2 * k, 4 * k), range(6 * k, 8 * k))), setup=4 * k)
+
+# H x W board with random lakes of the given density
+def random_lakes(H, W, density, seed=0, setup=0):
+    rng = random.Random(seed)
+    return Board(H, W, lakes=[ (r, c) for r in range(H) for c in range(W) if rng.random() < density ], setup=setup)
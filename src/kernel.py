@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from array import array
+from collections import Counter, namedtuple
+from itertools import combinations, product
+import time
+
+from branch_and_bound import exhaustive_independent_set, maximum_independent_set
+from geometry import bit, bits, popcount, random_lakes, scaled, setup_area, stratego
+
+# The scout threat graph has the open squares as vertices, and an edge between each two squares on a common segment.
+# It is stored in compressed sparse row (CSR) form: vertex i is the square squares[i] of the board, and its neighbours
+# are indices[indptr[i]:indptr[i + 1]]. The reductions below work on bitsets of vertices.
+Graph = namedtuple('Graph', ['squares', 'indptr', 'indices'])
+
+# A kernel is the graph that remains after the reductions, together with the squares that they fixed, as bitboards:
+# the included squares are in some optimal solution, the excluded ones can be left empty, and for domination,
+# the required squares are the ones that still have to be dominated. The fired counter tallies the reductions.
+Kernel = namedtuple('Kernel', ['graph', 'included', 'excluded', 'required', 'fired'])
+
+def csr(squares, neighbours):
+    indptr, indices = array('i', [ 0 ]), array('i')
+    for i in range(len(squares)):
+        indices.extend(sorted(neighbours(i)))
+        indptr.append(len(indices))
+    return Graph(array('i', squares), indptr, indices)
+
+def threat_graph(board):
+    squares = list(bits(board.open))
+    index = { sq: i for i, sq in enumerate(squares) }
+    return csr(squares, lambda i: [ index[t] for t in bits(board.attacks[squares[i]]) ])
+
+def neighbours(graph, i):
+    return graph.indices[graph.indptr[i]:graph.indptr[i + 1]]
+
+# Closed neighbourhoods as bitsets of vertices
+def closed(graph):
+    return [ bit(i) | sum(bit(j) for j in neighbours(graph, i)) for i in range(len(graph.squares)) ]
+
+# Union of bitsets, which may overlap
+def union(sets):
+    result = 0
+    for s in sets:
+        result |= s
+    return result
+
+# Subgraph induced by a bitset of vertices
+def induced(graph, vertices):
+    kept = list(bits(vertices))
+    index = { i: k for k, i in enumerate(kept) }
+    return csr([ graph.squares[i] for i in kept ], lambda k: [ index[j] for j in neighbours(graph, kept[k]) if j in index ])
+
+# Bitboard of the squares of a bitset of vertices
+def squares(graph, vertices):
+    return sum(bit(graph.squares[i]) for i in bits(vertices))
+
+# Crown rule for independent sets (Nemhauser-Trotter): the LP relaxation of vertex cover has a half-integral optimum that
+# follows from a minimum vertex cover of the bipartite double cover, i.e. from a maximum matching by König's theorem.
+# Some maximum independent set contains the vertices with both copies outside the cover, and none of those with both inside.
+def nemhauser_trotter(N, alive):
+    match = {}
+
+    def augment(u, seen):
+        for v in bits(N[u] & alive & ~bit(u)):
+            if v in seen:
+                continue
+            seen.add(v)
+            if v not in match or augment(match[v], seen):
+                match[v] = u
+                return True
+        return False
+
+    for u in bits(alive):
+        augment(u, set())
+
+    # Alternating paths from the unmatched left copies
+    matched = set(match.values())
+    left = { u for u in bits(alive) if u not in matched }
+    right, frontier = set(), list(left)
+    while frontier:
+        u = frontier.pop()
+        for v in bits(N[u] & alive & ~bit(u)):
+            if v not in right:
+                right.add(v)
+                if v in match and match[v] not in left:
+                    left.add(match[v])
+                    frontier.append(match[v])
+
+    # The cover consists of the unreached left copies and the reached right copies
+    inside = sum(bit(v) for v in bits(alive) if v in left and v not in right)
+    outside = sum(bit(v) for v in bits(alive) if v not in left and v in right)
+    return inside, outside
+
+independence_rules = ('simplicial', 'domination', 'crown')
+domination_rules = ('degree', 'requirement', 'candidate')
+
+# Reductions for a maximum independent set of scouts (puzzle IV), restricted to some of the rules for the self-check
+def independence(board, rules=independence_rules):
+    graph = threat_graph(board)
+    N = closed(graph)
+    alive, included, excluded, fired = (1 << len(graph.squares)) - 1, 0, 0, Counter()
+
+    changed = True
+    while changed:
+        changed = False
+        for v in bits(alive):
+            if not alive >> v & 1:
+                continue
+            nv = N[v] & alive
+
+            # Simplicial rule (including degrees 0 and 1): the neighbours of v form a clique, so v can replace any of them
+            if 'simplicial' in rules and all(N[u] & nv == nv for u in bits(nv)):
+                included, excluded, alive = included | bit(v), excluded | (nv & ~bit(v)), alive & ~nv
+                fired['simplicial'] += 1
+                changed = True
+                continue
+
+            # Domination rule (including true twins): a neighbour u of v with N[u] inside N[v] can replace v
+            if 'domination' in rules and any(not N[u] & alive & ~nv for u in bits(nv & ~bit(v))):
+                excluded, alive = excluded | bit(v), alive & ~bit(v)
+                fired['domination'] += 1
+                changed = True
+
+        if not changed and alive and 'crown' in rules:
+            inside, outside = nemhauser_trotter(N, alive)
+            if inside | outside:
+                included, excluded, alive = included | inside, excluded | outside, alive & ~(inside | outside)
+                fired['crown'] += popcount(inside | outside)
+                changed = True
+
+    return Kernel(induced(graph, alive), squares(graph, included), squares(graph, excluded), 0, fired)
+
+# Reductions for a minimum dominating set of scouts (puzzle III), seen as a set cover of the required squares by the closed
+# neighbourhoods of the candidate squares, restricted to some of the rules for the self-check
+def domination(board, rules=domination_rules):
+    graph = threat_graph(board)
+    N = closed(graph)
+    candidates = required = (1 << len(graph.squares)) - 1
+    included, excluded, fired = 0, 0, Counter()
+
+    changed = True
+    while changed:
+        changed = False
+
+        # Degree rule: a required square with a single candidate left forces that candidate
+        for r in bits(required):
+            if not required >> r & 1:
+                continue
+            c = N[r] & candidates
+            if 'degree' in rules and popcount(c) == 1:
+                included, candidates, required = included | c, candidates & ~c, required & ~N[c.bit_length() - 1]
+                fired['degree'] += 1
+                changed = True
+
+        # Requirement domination: a square whose candidates include all those of another required square is dominated with it
+        for r in bits(required):
+            if not required >> r & 1:
+                continue
+            if 'requirement' in rules and any(N[t] & candidates & ~N[r] == 0 for t in bits(required & ~bit(r) & union(N[c] for c in bits(N[r] & candidates)))):
+                required &= ~bit(r)
+                fired['requirement'] += 1
+                changed = True
+
+        # Candidate domination (including twins): a candidate whose required squares are all dominated by another candidate
+        for c in bits(candidates):
+            if not candidates >> c & 1:
+                continue
+            if 'candidate' in rules and (not N[c] & required or any(N[c] & required & ~N[t] == 0 for t in bits(candidates & ~bit(c) & union(N[r] for r in bits(N[c] & required))))):
+                excluded, candidates = excluded | bit(c), candidates & ~bit(c)
+                fired['candidate'] += 1
+                changed = True
+
+    return Kernel(induced(graph, candidates | required), squares(graph, included), squares(graph, excluded), squares(graph, required), fired)
+
+reductions = {
+    'scout_independence': independence,
+    'scout_domination':   domination
+}
+
+# A solution on the kernel maps back to one on the board by adding the included squares
+def lift(kernel, scouts):
+    return kernel.included | scouts
+
+# Squares that are occupied or threatened by a scout
+def dominated(board, scouts):
+    return union(bit(sq) | board.attacks[sq] for sq in bits(scouts))
+
+# Smallest set of candidate squares that dominates the required squares, trying all sets in order of size, for checking on small boards
+def exhaustive_dominating_set(board, candidates, required):
+    for size in range(popcount(candidates) + 1):
+        for chosen in combinations(bits(candidates), size):
+            if not required & ~dominated(board, sum(bit(sq) for sq in chosen)):
+                return size, sum(bit(sq) for sq in chosen)
+    return None, 0
+
+# Compare the optimum on the kernel plus the included squares with exhaustive search on small boards with random lakes, for all
+# rules together and for each rule alone, since the crown rule never fires after the simplicial and domination rules on these boards.
+# Returns the failures, including the rules that fired on none of the boards.
+def selfcheck(size=5, seeds=4, densities=(0.1, 0.2, 0.3)):
+    failures, fired = [], Counter()
+    for H, W, density, seed in product(range(3, size + 1), range(3, size + 1), densities, range(seeds)):
+        board = random_lakes(H, W, density, seed)
+        label = "%sx%s board with lake density %s and seed %s" % (H, W, density, seed)
+
+        value, _ = exhaustive_independent_set(board)
+        for rules in [ independence_rules ] + [ (rule, ) for rule in independence_rules ]:
+            kernel = independence(board, rules)
+            fired.update(kernel.fired)
+            kernel_value, kernel_scouts = exhaustive_independent_set(board, sum(bit(sq) for sq in kernel.graph.squares))
+            scouts = lift(kernel, kernel_scouts)
+            if kernel_value + popcount(kernel.included) != value or any(board.attacks[sq] & scouts for sq in bits(scouts)):
+                failures.append(('scout_independence', rules, label))
+
+        value, _ = exhaustive_dominating_set(board, board.open, board.open)
+        for rules in [ domination_rules ] + [ (rule, ) for rule in domination_rules ]:
+            kernel = domination(board, rules)
+            fired.update(kernel.fired)
+            candidates = sum(bit(sq) for sq in kernel.graph.squares) & ~kernel.excluded
+            kernel_value, kernel_scouts = exhaustive_dominating_set(board, candidates, kernel.required)
+            scouts = lift(kernel, kernel_scouts)
+            if kernel_value is None or kernel_value + popcount(kernel.included) != value or board.open & ~dominated(board, scouts):
+                failures.append(('scout_domination', rules, label))
+
+    failures += [ (module, (rule, ), None) for module, rules in [
+        ('scout_independence', independence_rules), ('scout_domination', domination_rules)
+    ] for rule in rules if not fired[rule] ]
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Kernelize the scout threat graph of the independence and domination puzzles.")
+    parser.add_argument('--scale', type=int, nargs='*', default=[ 1, 2, 3 ], help="scale the Stratego board and its lakes by these factors")
+    parser.add_argument('--check', action='store_true', help="check the kernels against exhaustive search on small boards with random lakes instead")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = selfcheck()
+        for module, rules, label in failures:
+            print("%s kernel (%s) is wrong on the %s" % (module, ', '.join(rules), label) if label else "%s %s rule fired on no board" % (module, rules[0]))
+        print("All kernels agree with exhaustive search, and each rule fired." if not failures else "%s failures." % len(failures))
+        raise SystemExit(1 if failures else 0)
+
+    for board in [ setup_area ] + [ scaled(k) if k > 1 else stratego for k in args.scale ]:
+        graph = threat_graph(board)
+        print("%sx%s board: %s vertices, %s edges" % (board.H, board.W, len(graph.squares), len(graph.indices) // 2))
+        for module, reduce in reductions.items():
+            start = time.perf_counter()
+            kernel = reduce(board)
+            elapsed = time.perf_counter() - start
+            print("    %-18s kernel of %s vertices, %s included, %s excluded (%s, %.1f ms)" % (
+                module, len(kernel.graph.squares), popcount(kernel.included), popcount(kernel.excluded),
+                ', '.join("%s %s" % item for item in sorted(kernel.fired.items())) or 'no reductions', 1000 * elapsed
+            ))
+
+        # The maximum independent set of the kernel lifts to one of the board
+        kernel = independence(board)
+        value, scouts = maximum_independent_set(board)
+        kernel_value, kernel_scouts = maximum_independent_set(board, squares(kernel.graph, (1 << len(kernel.graph.squares)) - 1))
+        assert kernel_value + popcount(kernel.included) == value
+        assert all(not board.attacks[sq] & lift(kernel, kernel_scouts) for sq in bits(lift(kernel, kernel_scouts)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from importlib import import_module
+from inspect import signature
+from itertools import product
+import multiprocessing
+import time
+
+from catalog import diagram, puzzles
+from puzzle import Log, solvers
+
+# Configurations of a puzzle: its script and the keyword arguments of its solve() function.
+# The solver varies fastest, and the defaults of the script come first, so that the first few workers already
+# cover all solvers. All variants with the original constraint order come first, followed by those with shuffled orders.
+def configurations(puzzle, seeds=4):
+    module, kwargs = puzzles[puzzle]
+    script = import_module(module)
+    defaults = { name: p.default for name, p in signature(script.model).parameters.items() }
+    encodings = sorted(getattr(script, 'encodings', [ None ]), key=lambda e: e != defaults.get('encoding'))
+    for seed in range(seeds):
+        for encoding, cardinality, solver in product(encodings, (True, False), sorted(solvers, key=lambda s: s != defaults['solver'])):
+            options = dict(kwargs, solver=solver, seed=seed, order=seed if seed else None, params=[ ('sat.cardinality.solver', cardinality) ])
+            if encoding is not None:
+                options['encoding'] = encoding
+            yield module, options
+
+def run(config, log=None, progress=None):
+    module, options = config
+    start = time.perf_counter()
+    result = import_module(module).solve(log=log, progress=progress, **options)
+    return config, result, time.perf_counter() - start
+
+# Run a configuration with a structured log that is labeled by its index and options
+def logged(task):
+    index, (module, options), path, progress = task
+    return run((module, options), Log(path, echo=False, config=index, module=module, **options) if path else None, progress)
+
+# Solve all configurations in a process pool, and terminate the pool as soon as one of them gives a definitive answer.
+# Each configuration can append its phase timings and progress to a shared structured log, labeled by its index.
+def portfolio(configs, jobs=None, timeout=None, log=None, progress=None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with multiprocessing.Pool(jobs) as pool:
+        results = pool.imap_unordered(logged, [ (index, config, log, progress) for index, config in enumerate(configs) ])
+        while True:
+            try:
+                config, result, elapsed = results.next(None if deadline is None else max(0, deadline - time.monotonic()))
+            except (StopIteration, multiprocessing.TimeoutError):
+                return None
+            if result.verdict != 'unknown':
+                return config, result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a portfolio of encodings, solvers, parameters and seeds on one of the puzzles, and report the first definitive answer.")
+    parser.add_argument('puzzle', choices=list(puzzles))
+    parser.add_argument('--jobs', type=int, default=None, help="number of worker processes (default: number of cores)")
+    parser.add_argument('--seeds', type=int, default=4, help="number of random seeds per configuration")
+    parser.add_argument('--timeout', type=float, default=None, help="give up after this many seconds")
+    parser.add_argument('--progress', type=float, default=None, metavar='SECONDS', help="log the progress of the search at this interval")
+    parser.add_argument('--log', default=None, metavar='FILE', help="append the structured log of all configurations as JSON lines to this file")
+    args = parser.parse_args()
+
+    configs = list(configurations(args.puzzle, args.seeds))
+    print("Running %s configurations of puzzle %s." % (len(configs), args.puzzle))
+    winner = portfolio(configs, args.jobs, args.timeout, args.log, args.progress)
+    if winner is None:
+        print("No configuration gave a definitive answer.")
+        return
+    (module, options), result, elapsed = winner
+    print("Winner after %.2f seconds: %s %s" % (elapsed, module, options))
+    print("Verdict: %s, value == %s." % (result.verdict, result.value))
+    if result.pieces:
+        print(diagram(import_module(module).area, result.pieces))
+
+if __name__ == '__main__':
+    main()
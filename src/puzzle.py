@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+from collections import namedtuple
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import random
+import sys
+import time
+from z3 import And, BitVecVal, Bool, BoolVal, Concat, FreshBool, get_param, If, Implies, is_true, Not, Optimize, reset_params, sat, set_param, Solver, SolverFor, Sum, unknown, unsat
+
+from bounds import bracket
+from cache import Cache
+import cardinality
+from catalog import parse, puzzles
+from geometry import popcount
+
+# Z3's default solver, the finite-domain solver (a SAT core with native cardinality constraints), and the optimizer
+solvers = {
+    'default':  Solver,
+    'fd':       lambda: SolverFor("QF_FD"),
+    'optimize': Optimize
+}
+
+# The verdict is 'sat' for a proven optimum or a feasible target, 'unsat' for an infeasible target,
+# and 'unknown' otherwise. The pieces are bitboards keyed by the name of their grid.
+Result = namedtuple('Result', ['verdict', 'value', 'pieces'])
+
+# Solver parameters are global in Z3, so each solve starts from the defaults
+def configure(seed=0, params=()):
+    reset_params()
+    set_param('smt.random_seed', seed)
+    set_param('sat.random_seed', seed)
+    for key, value in params:
+        set_param(key, value)
+
+# Z3 parameters that tune.py found for each puzzle, stored as JSON next to the scripts
+profiles = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+
+# The puzzle that a script solves with the given keyword arguments (its first puzzle, if they leave it open)
+def puzzle_of(module, kwargs):
+    return next((
+        name
+        for name, (m, k) in puzzles.items()
+        if m == module and all(key not in kwargs or json.dumps(kwargs[key]) == json.dumps(value) for key, value in k.items())
+    ), None)
+
+# The tuned parameters of a puzzle, if tune.py stored them for the solver that it is solved with.
+# Explicit parameters are set after them, and take precedence.
+def tuning(module, kwargs, log=None):
+    name = puzzle_of(module, kwargs)
+    path = os.path.join(profiles, "%s.json" % name)
+    if name is None or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        profile = json.load(f)
+    if kwargs.get('solver', profile['solver']) != profile['solver']:
+        return []
+    params = [ tuple(p) for p in profile['params'] ]
+    if log:
+        log('profile', puzzle=name, params=', '.join("%s=%s" % p for p in params) or 'defaults')
+    return params
+
+# Text format of the events in the structured log
+formats = {
+    'phase':     "Phase %(phase)s: %(seconds).3f seconds",
+    'bound':     "N %(op)s %(n)s: %(result)s",
+    'objective': "N == %(value)s",
+    'bounds':    "Bounds: %(lower)s <= N <= %(upper)s (gap %(gap)s)",
+    'hint':      "Completing %(pieces)s hinted pieces: %(result)s",
+    'cuts':      "Refined with %(n)s violated constraints",
+    'profile':   "Tuned parameters of puzzle %(puzzle)s: %(params)s",
+    'cache':     "Cached result %(key).16s: %(verdict)s",
+    'resume':    "Resuming with %(done)s of %(cubes)s cubes solved",
+    'cube':      "Cubes solved: %(done)s/%(cubes)s (cube %(cube)s: %(verdict)s in %(seconds).2f seconds)",
+    'point':     "Budgets %(red)s + %(blue)s: N == %(value)s (%(verdict)s, %(source)s, %(seconds).2f seconds)",
+    'progress':  "%(seconds).1f seconds: %(conflicts)s conflicts (%(rate).0f per second), %(restarts)s restarts, %(memory).1f MB"
+}
+
+# Structured log: each event is printed as text and/or appended as a JSON line to a file, together with a fixed context
+# (such as the configuration of a portfolio run). The file is reopened for each event, so that several processes can share it.
+class Log:
+    def __init__(self, path=None, echo=True, **context):
+        self.path, self.echo, self.context = path, echo, context
+
+    def __call__(self, event, **fields):
+        if self.echo:
+            print(formats[event] % fields, flush=True)
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(dict(self.context, time=time.time(), event=event, **fields)) + '\n')
+
+# Counters in the statistics of a solver, under their names in the SMT core and in the SAT core
+counters = {
+    'conflicts':  [ 'conflicts', 'sat conflicts' ],
+    'decisions':  [ 'decisions', 'sat decisions' ],
+    'restarts':   [ 'restarts', 'sat restarts' ],
+    'max memory': [ 'max memory', 'memory' ]
+}
+
+def counter(statistics, names):
+    return next((statistics[key] for key in names if key in statistics), 0)
+
+def statistics(s):
+    st = s.statistics()
+    return { key: st.get_key_value(key) for key in st.keys() }
+
+# Lap timer over the phases of a solve (variables, constraints, solve, decode): each call ends a phase, logs its wall-clock
+# seconds and records them in stats, together with the statistics of the solver if one is given
+def laps(log=None, stats=None):
+    last = time.perf_counter()
+
+    def lap(phase, s=None):
+        nonlocal last
+        now = time.perf_counter()
+        if log:
+            log('phase', phase=phase, seconds=now - last)
+        if stats is not None:
+            stats[phase] = now - last
+            if s is not None:
+                stats['statistics'] = statistics(s)
+        last = now
+
+    return lap
+
+# Profile the Python side of a solve (the construction of the model) with cProfile, and dump the profile to a file
+@contextmanager
+def profiling(path=None):
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+# Check the solver in slices of the progress interval, and log the statistics of the search after each slice.
+# The solver keeps its learned clauses between the slices, and a global timeout still applies to the whole check.
+def sliced(s, *assumptions, log=None, progress=None):
+    if log is None or progress is None or isinstance(s, Optimize):
+        return s.check(*assumptions)
+    timeout = int(get_param('timeout'))
+    start = time.perf_counter()
+    deadline = start + timeout / 1000 if timeout < 2**32 - 1 else None
+    conflicts = counter(statistics(s), counters['conflicts'])
+    try:
+        while True:
+            interval = progress if deadline is None else min(progress, deadline - time.perf_counter())
+            if interval <= 0:
+                return unknown
+            s.set('timeout', max(1, int(1000 * interval)))
+            result = s.check(*assumptions)
+            if result != unknown or s.reason_unknown() not in ('timeout', 'canceled'):
+                return result
+            seconds, st = time.perf_counter() - start, statistics(s)
+            log('progress',
+                seconds=seconds,
+                conflicts=counter(st, counters['conflicts']) - conflicts,
+                rate=(counter(st, counters['conflicts']) - conflicts) / seconds,
+                restarts=counter(st, counters['restarts']),
+                memory=counter(st, counters['max memory'])
+            )
+    finally:
+        s.set('timeout', timeout)
+
+# Lazy constraint generation: refine returns the constraints that a model violates, which are added before checking again,
+# until a model violates none of them and therefore satisfies the full set of constraints
+# A warm start first tries to complete the hinted pieces (for instance a known solution), with the hint as assumptions.
+# The SAT core ignores initial values, but completing a solution takes little more than propagation, and otherwise the failed
+# check only costs the conflict that refutes the hint.
+def check(s, *assumptions, log=None, progress=None, refine=None, hint=()):
+    if hint:
+        result = check(s, *assumptions, *hint, log=log, progress=progress, refine=refine)
+        if log:
+            log('hint', pieces=len(hint), result=str(result))
+        if result == sat:
+            return result
+    while True:
+        result = sliced(s, *assumptions, log=log, progress=progress)
+        cuts = refine(s.model()) if refine and result == sat else []
+        if not cuts:
+            return result
+        if log:
+            log('cuts', n=len(cuts))
+        s.add(cuts)
+
+# Add constraints to the solver, optionally in a shuffled order
+def add(s, constraints, order=None):
+    constraints = list(constraints)
+    if order is not None:
+        random.Random(order).shuffle(constraints)
+    s.add(constraints)
+
+def variables(board, name):
+    return [ [ Bool("%s_%s%s" % (name, r, c)) for c in range(board.W) ] for r in range(board.H) ]
+
+# A grid of variables as a single bit-vector term with bit r * W + c for square (r, c), so that a model is decoded
+# with one evaluation per grid instead of one per square (0.1 instead of 3 milliseconds for puzzle VI)
+def packed(grid):
+    return Concat([ If(x, BitVecVal(1, 1), BitVecVal(0, 1)) for row in reversed(grid) for x in reversed(row) ])
+
+def bitboard(model, term):
+    return model.evaluate(term, model_completion=True).as_long()
+
+# Callers that decode many models of the same grids can pack them once
+def pieces(board, model, grids, terms=None):
+    terms = terms or { name: packed(grid) for name, grid in grids.items() }
+    return { name: bitboard(model, terms[name]) for name in grids }
+
+# Pass the improving models of a search to the incumbent callback as pieces
+def anytime(board, grids, incumbent):
+    if incumbent is None:
+        return None
+    terms = { name: packed(grid) for name, grid in grids.items() }
+    return lambda model, value, lower, upper: incumbent(pieces(board, model, grids, terms), value, lower, upper)
+
+# The pieces of a hint as literals
+def hinted(board, grids, hint):
+    p = parse(board, hint)
+    return [ grid[r][c] for name, grid in grids.items() for (r, c) in board.squares_of(p[name]) ]
+
+# Run the search of a model, time it, and decode the pieces, or look up the result in the cache. The search function returns
+# a verdict and a model, and the question identifies it: the goal of an optimization, or a target number of pieces.
+def decide(board, s, grids, objective, question, search, lap, cache=None, log=None):
+    key = cache.key(s, question) if cache else None
+    entry = cache.load(key) if cache else None
+    if entry is not None:
+        cache.discard()
+        if log:
+            log('cache', key=key, verdict=entry['verdict'])
+        return Result(entry['verdict'], entry['value'], entry['pieces'])
+    verdict, m = search()
+    lap('solve', s)
+    if m is None:
+        result = Result(verdict, None, {})
+    else:
+        p = pieces(board, m, grids)
+        lap('decode')
+        result = Result(verdict, popcount(p[objective]), p)
+    if cache:
+        cache.store(key, question, result, statistics(s))
+    return result
+
+# Maximize or minimize the number of true literals between a priori bounds, of which only multiples of step can be feasible.
+# With a weight, each true literal counts that many times (the bounds and the step are in weighted units).
+# The optimizer does this directly. The other solvers do a galloping search with assumption literals on a single incremental
+# solver: double the step after each success, restart it after each failure. Learned clauses are kept between the calls.
+# The bounds on the number of true literals are emitted with the given cardinality encoding.
+# The optimizer logs its improving solutions, the other solvers log their progress during each check.
+# Bounds from a relaxation can also be asserted up front to prune the search: all optimal solutions satisfy them. Asserting
+# the bound on the side of the goal as well makes it much harder to find a first model (N <= 8 for puzzle III: 0.04 -> 138 seconds).
+# With lazy constraints, every model is refined before it counts, so that an optimum of the relaxation that violates nothing is optimal.
+# A hint is given to the optimizer as initial values, and to the first check of the other solvers as assumptions. Later checks need
+# no hint, since the SAT core saves the phases of the previous model.
+# Each improving model is passed to the incumbent callback, together with its value and the bounds proven so far. When the search
+# runs out of time, it returns the best model so far with an unknown verdict.
+# Under assumption literals, the other solvers guard the bounds that they learn with a fresh literal of the call, which only its
+# own checks assume, so that the same solver can optimize again under other assumptions (see the sweep of scout_bomb_independence.py).
+# Guarding them with the assumptions themselves would not do: other assumptions can imply these (a smaller budget implies the larger ones).
+def optimize(s, literals, goal, lower, upper, step=1, log=None, progress=None, encoding='native', tighten=False, refine=None, hint=(), incumbent=None, weight=1, assumptions=()):
+    def count(model):
+        return weight * sum(1 for lit in literals if is_true(model.evaluate(lit)))
+
+    def report(model):
+        if incumbent:
+            incumbent(model, count(model), lower, upper)
+
+    # Round the bounds inward to the multiples of step, so that the search cannot end with upper < lower
+    upper, lower = upper - upper % step, lower + -lower % step
+
+    if tighten:
+        s.add(cardinality.at_most(literals, upper // weight, encoding) if goal == 'max' else cardinality.at_least(literals, -(-lower // weight), encoding))
+
+    if isinstance(s, Optimize):
+        objective = Sum([ If(lit, weight, 0) for lit in literals ])
+        if goal == 'max':
+            s.maximize(objective)
+        else:
+            s.minimize(objective)
+        # With lazy constraints, the improving models of the relaxation need not be solutions
+        best, last = [], []
+        def improved(model):
+            value = count(model)
+            if log and last != [ value ]:
+                log('objective', value=value)
+            last[:] = [ value ]
+            if refine is None:
+                best[:] = [ model ]
+                if incumbent:
+                    incumbent(model, value, value if goal == 'max' else lower, upper if goal == 'max' else value)
+
+        s.set_on_model(improved)
+        # Z3 before 4.13 has no initial values: the hint then becomes a soft constraint of a second objective, which the
+        # lexicographic priority only considers among the optimal solutions of the first
+        for x in hint:
+            if hasattr(s, 'set_initial_value'):
+                s.set_initial_value(x, BoolVal(True))
+            else:
+                s.add_soft(x, id='hint')
+        result = check(s, log=log, refine=refine)
+        return (str(result), s.model()) if result == sat else (str(result), best[0] if best else None)
+
+    scope = [ FreshBool('scope') ] if assumptions else []
+    assumptions = list(assumptions) + scope
+    result = check(s, *assumptions, log=log, progress=progress, refine=refine, hint=hint)
+    if result != sat:
+        return str(result), None
+    best = s.model()
+    if goal == 'max':
+        lower = max(lower, count(best))
+    else:
+        upper = min(upper, count(best))
+    report(best)
+
+    # While the a priori bound is better than the best model, the search first probes the bound itself
+    delta = step
+    while lower < upper or count(best) != (lower if goal == 'max' else upper):
+        reached = count(best) == (lower if goal == 'max' else upper)
+        if goal == 'max':
+            n = min(lower + delta, upper) if reached else lower
+        else:
+            n = max(upper - delta, lower) if reached else upper
+        bound = cardinality.at_least(literals, -(-n // weight), encoding) if goal == 'max' else cardinality.at_most(literals, n // weight, encoding)
+        lit = Bool("%s_%s" % ('at_least' if goal == 'max' else 'at_most', n))
+        s.add(Implies(lit, And(bound)))
+        result = check(s, *assumptions, lit, log=log, progress=progress, refine=refine)
+        if log:
+            log('bound', op='>=' if goal == 'max' else '<=', n=n, result=str(result), lower=lower, upper=upper)
+        if result == sat:
+            best = s.model()
+            if goal == 'max':
+                lower = max(lower, count(best))
+            else:
+                upper = min(upper, count(best))
+            s.add(Implies(scope[0], lit) if scope else lit)
+            delta *= 2
+            report(best)
+        elif result == unsat:
+            if goal == 'max':
+                upper = n - step
+                lower = min(lower, upper)
+            else:
+                lower = n + step
+                upper = max(upper, lower)
+            s.add(Implies(scope[0], Not(lit)) if scope else Not(lit))
+            delta = step
+            report(best)
+        else:
+            return 'unknown', best
+    return 'sat', best
+
+# The name of a script's module in the catalog, also when it runs as the main program
+def module_name(module):
+    if module != '__main__':
+        return module
+    return os.path.splitext(os.path.basename(sys.modules['__main__'].__file__))[0]
+
+# Keyword arguments of the solve() functions of the scripts, with their defaults. The others are those of the models.
+settings = {
+    'seed':      0,
+    'params':    (),
+    'log':       None,
+    'stats':     None,
+    'progress':  None,
+    'profile':   None,
+    'cache':     None,
+    'bounds':    False,
+    'hint':      None,
+    'incumbent': None,
+    'tuned':     False,
+    'cuts':      False
+}
+
+# The solve() function of the scripts: minimize or maximize the pieces of the objective grid (or other literals, with a weight),
+# or place exactly count of them. A refined model is a lazy one, which the violated() function of the script refines.
+def solution(module, board, objective, goal, upper, literals=None, weight=1, step=1, refined=False, count=None, **kwargs):
+    script, name = sys.modules[module], module_name(module)
+    given = { key: kwargs.pop(key, default) for key, default in settings.items() }
+    log, cache, bounds = given['log'], given['cache'], given['bounds']
+    configure(given['seed'], (tuning(name, kwargs, log) if given['tuned'] else []) + list(given['params']) + (cache.params() if cache else []))
+    lap = laps(log, given['stats'])
+    with profiling(given['profile']):
+        s, grids = script.model(lap=lap, **kwargs)
+    encoding = kwargs.get('cardinality', 'native')
+    # cores.py imports this module, so that its cuts are only imported when they are asked for
+    if given['cuts']:
+        from cores import constraints, load
+        s.add(constraints(load(name, kwargs), grids[objective], encoding))
+    hint = hinted(board, grids, given['hint']) if given['hint'] else []
+    literals = literals or [ grids[objective][r][c] for (r, c) in board.board() ]
+    refine = script.violated(grids) if refined else None
+    lower, upper = bracket(name, log, **kwargs) if bounds else (0, upper)
+
+    def search():
+        if count is None:
+            return optimize(s, literals, goal, lower, upper, step=step, log=log, progress=given['progress'], encoding=encoding, tighten=bounds, hint=hint, incumbent=anytime(board, grids, given['incumbent']), refine=refine, weight=weight)
+        s.add(cardinality.exactly(literals, count, encoding))
+        result = check(s, log=log, progress=given['progress'], refine=refine, hint=hint)
+        return str(result), s.model() if result == sat else None
+
+    return decide(board, s, grids, objective, goal if count is None else [ 'exactly', count ], search, lap, cache, log)
+
+# Command-line options shared by all puzzles
+def add_arguments(parser, solver):
+    parser.add_argument('--solver', choices=list(solvers), default=solver, help="Z3 solver to use (default: %(default)s)")
+    parser.add_argument('--symmetry', action='store_true', help="break the reflection symmetries of the board with lex-leader constraints")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the SAT and SMT cores")
+    parser.add_argument('--order', type=int, default=None, help="shuffle the constraints with this random seed")
+    parser.add_argument('--cardinality', choices=cardinality.encodings, default='native', help="encoding of the cardinality constraints (default: %(default)s)")
+    parser.add_argument('--param', nargs=2, action='append', default=[], metavar=('KEY', 'VALUE'), help="set a Z3 parameter, e.g. sat.cardinality.solver true")
+    parser.add_argument('--progress', type=float, default=None, metavar='SECONDS', help="report the progress of the search at this interval")
+    parser.add_argument('--log', default=None, metavar='FILE', help="append the structured log as JSON lines to this file")
+    parser.add_argument('--profile', default=None, metavar='FILE', help="dump a cProfile profile of the model construction to this file")
+    parser.add_argument('--hint', default=None, metavar='FILE', help="warm start the search from the diagram in this file, e.g. a known solution")
+    parser.add_argument('--bounds', action='store_true', help="seed the search with the bounds of bounds.py")
+    parser.add_argument('--untuned', action='store_true', help="ignore the Z3 parameters that tune.py stored for the puzzle")
+    parser.add_argument('--cache', default=None, metavar='DIR', help="look up and store results in this cache directory")
+    parser.add_argument('--proof', action='store_true', help="store DRAT proofs of the SAT core's search in the cache")
+    return parser
+
+def options(args):
+    return {
+        'solver':      args.solver,
+        'symmetry':    args.symmetry,
+        'seed':        args.seed,
+        'order':       args.order,
+        'cardinality': args.cardinality,
+        'params':      [ (key, value) for key, value in args.param ],
+        'tuned':       not args.untuned,
+        'log':         Log(args.log) if args.log or args.progress is not None else None,
+        'progress':    args.progress,
+        'profile':     args.profile,
+        'cache':       Cache(args.cache, args.proof) if args.cache else None,
+        'bounds':      args.bounds,
+        'hint':        open(args.hint).read() if args.hint else None
+    }
@@ -5,206 +5,326 @@
 #    (See accompanying file LICENSE_1_0.txt or copy at
 #          http://www.boost.org/LICENSE_1_0.txt)
 
-from itertools import chain, product, repeat
-import numpy as np
-from z3 import And, Bool, If, Implies, Not, Or, PbEq, PbLe, sat, Solver, Sum
+import argparse
+import json
+import multiprocessing
+import queue
+import time
+from z3 import And, Bool, Implies, Not, Or
 
-# Stratego board
-H, W =  10, 10
-
-def board():
-    return product(range(H), range(W))
+from cardinality import at_most
+from catalog import diagram
+from geometry import popcount, stratego
+from puzzle import add, add_arguments, configure, laps, Log, optimize, options, packed, pieces, solution, solvers, variables
+from symmetry import image, reflections, symmetry_breaking
+from verify import verified
 
-def lakes():
-    return product(range(4, 6), chain(range(2, 4), range(6, 8)))
+# Stratego board
+area = stratego
+H, W = stratego.H, stratego.W
+board, lakes = stratego.board, stratego.lake_squares
+segments, scout_moves_from, between = stratego.segments, stratego.scout_moves_from, stratego.between
 
 def dmz():
-    return product(range(4, 6), chain(range(0, 2), range(4, 6), range(8, W)))
+    return stratego.squares_of(stratego.dmz)
 
 def red_setup():
-    return product(range(0, 4), range(W))
+    return stratego.squares_of(stratego.red_setup)
 
 def blu_setup():
-    return product(range(6, H), range(W))
-
-# Board display
-def piece(m, r, c):
-    return '#' if (r, c) in lakes() else '2' if m.evaluate(is_scout[r][c]) else 'B' if m.evaluate(is_bomb[r][c]) else '.'
-
-def diagram(model):
-    b = np.array([ piece(model, r, c) for (r, c) in board() ]).reshape(H, W)
-    return "%s" % '\n'.join(map(lambda row: ' '.join(map(str, row)), b))
+    return stratego.squares_of(stratego.blu_setup)
 
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=11671
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=458177
-print("The maximum number of scouts on a Stratego board with at most 6 bombs in each setup area such that no scout threatens another scout.")
-
-# Variables
-is_scout = np.array([ Bool("is_scout_%s%s" % (r, c)) for (r, c) in board() ]).reshape(H, W).tolist()
-is_bomb  = np.array([ Bool("is_bomb_%s%s"  % (r, c)) for (r, c) in board() ]).reshape(H, W).tolist()
-
-# Piece placement
-no_scouts_and_bombs_on_same_square = [ Not(And(is_scout[r][c], is_bomb[r][c])) for (r, c) in board() ]
-no_scouts_or_bombs_in_lakes = [ Not(Or(is_scout[r][c], is_bomb[r][c])) for (r, c) in lakes() ] 
-no_bombs_in_dmz = [ Not(is_bomb[r][c]) for (r, c) in dmz() ]
-at_most_six_bombs_in_red_setup = PbLe([ (is_bomb[r][c], 1) for (r, c) in red_setup() ], 6)
-at_most_six_bombs_in_blu_setup = PbLe([ (is_bomb[r][c], 1) for (r, c) in blu_setup() ], 6)
-
-# Segments
-open_rows = [ list(zip(repeat(r), range(W))) for r in chain(range(0, 4), range(6, H)) ]
-open_cols = [ list(zip(range(H), repeat(c))) for c in chain(range(0, 2), range(4, 6), range(8, W)) ]
-lake_rows = [ list(zip(repeat(r), range(c, c + 2))) for r in range(4, 6) for c in (0, 4, 8) ]
-lake_cols = [ list(zip(range(r, r + 4), repeat(c))) for r in (0, 6) for c in chain(range(2, 4), range(6, 8)) ]
-segments = open_rows + open_cols + lake_rows + lake_cols
-
-assert len(open_rows) == 8
-assert len(open_cols) == 6
-assert len(lake_rows) == 6
-assert len(lake_cols) == 8
-assert len(segments) == 28
-
-scout_sum_segment = [ Sum([ If(is_scout[r][c], 1, 0) for (r, c) in s ]) for s in segments  ]
-bomb_sum_segment = [ Sum([ If(is_bomb[r][c], 1, 0) for (r, c) in s ]) for s in segments  ]
-
-at_most_one_more_scout_than_bombs_per_segment = [
-    scout_sum_segment[i] <= bomb_sum_segment[i] + 1
-    for i, _ in enumerate(segments)
-]
-
-# Scout moves in the left (L), right (R), downward (D) and upward (U) directions
-def L_scout_moves_from(r, c):
-    if r in chain(range(0, 4), range(6, H)):
-        return range(0, c)
-    elif c in range(0, 2):
-        return range(0, c)
-    elif c in range(4, 6):
-        return range(4, c)
-    elif c in range(8, W):
-        return range(8, c)
-    else:
-        return range(0)
-
-def R_scout_moves_from(r, c):
-    if r in chain(range(0, 4), range(6, H)):
-        return range(c + 1, W)
-    elif c in range(0, 2):
-        return range(c + 1, 2)
-    elif c in range(4, 6):
-        return range(c + 1, 6)
-    elif c in range(8, W):
-        return range(c + 1, W)
-    else:
-        return range(0)
-
-def D_scout_moves_from(r, c):
-    if c in chain(range(0, 2), range(4, 6), range(8, W)):
-        return range(0, r)
-    elif r in range(0, 4):
-        return range(0, r)
-    elif r in range(6, H):
-        return range(6, r)
+def title(budget=6, sweep=None):
+    red, blue = budgets(budget)
+    if sweep is not None:
+        bombs = "at most 0 to %s bombs in each setup area" % sweep
+    elif red == blue:
+        bombs = "at most %s bombs in each setup area" % red
     else:
-        return range(0)
-
-def U_scout_moves_from(r, c):
-    if c in chain(range(0, 2), range(4, 6), range(8, W)):
-        return range(r + 1, H)
-    elif r in range(0, 4):
-        return range(r + 1, 4)
-    elif r in range(6, H):
-        return range(r + 1, H)
-    else:
-        return range(0)
-
-L_scout_moves_cols = np.array([
-    L_scout_moves_from(r, c)
-    for (r, c) in board()
-]).reshape(H, W)
-
-R_scout_moves_cols = np.array([
-    R_scout_moves_from(r, c)
-    for (r, c) in board()
-]).reshape(H, W)
-
-D_scout_moves_rows = np.array([
-    D_scout_moves_from(r, c)
-    for (r, c) in board()
-]).reshape(H, W)
-
-U_scout_moves_rows = np.array([
-    U_scout_moves_from(r, c)
-    for (r, c) in board()
-]).reshape(H, W)
-
-def squares_in_between(b, e):
-    return range(b + 1, e)
-
-no_scout_threatens_another_scout = [ 
-    Implies(
-        is_scout[r][c], 
-        And(
-            [
-                Implies(
-                    is_scout[r][cL],
-                    Or([
-                        is_bomb[r][cb]
-                        for cb in squares_in_between(cL, c)
-                    ])
-                )
-                for cL in L_scout_moves_cols[r, c]
-            ] +
-            [
-                Implies(
-                    is_scout[r][cR],
-                    Or([
-                        is_bomb[r][cb]
-                        for cb in squares_in_between(c, cR)
-                    ])
-                )
-                for cR in R_scout_moves_cols[r, c]
-            ] +
-            [
-                Implies(
-                    is_scout[rD][c],
-                    Or([
-                        is_bomb[rb][c]
-                        for rb in squares_in_between(rD, r)
-                    ])
-                )
-                for rD in D_scout_moves_rows[r, c]
-            ] +
-            [
+        bombs = "at most %s bombs in the red and %s bombs in the blue setup area" % (red, blue)
+    return "The maximum number of scouts on a Stratego board with %s such that no scout threatens another scout." % bombs
+
+# Grid of pieces whose number is optimized
+objective = 'scouts'
+
+# Pairwise encoding: scouts threaten each other unless there is a bomb on a square in between (cubic along each segment)
+def threat_blocked(is_bomb, a, b):
+    return Or([ is_bomb[r][c] for (r, c) in stratego.squares_of(between[stratego.square(*a), stratego.square(*b)]) ])
+
+def pairwise(is_scout, is_bomb):
+
+    return [
+        Implies(
+            is_scout[r][c],
+            And([
                 Implies(
-                    is_scout[rU][c],
-                    Or([
-                        is_bomb[rb][c]
-                        for rb in squares_in_between(r, rU)
-                    ])
+                    is_scout[rt][ct],
+                    threat_blocked(is_bomb, (r, c), (rt, ct))
                 )
-                for rU in U_scout_moves_rows[r, c]
-            ]
+                for (rt, ct) in scout_moves_from[r][c]
+            ])
         )
-    ) 
-    for (r, c) in board() if (r, c) not in lakes()
-]
-
-# Clauses
-s = Solver()
-s.add(no_scouts_and_bombs_on_same_square)
-s.add(no_scouts_or_bombs_in_lakes)
-s.add(no_bombs_in_dmz)
-s.add(at_most_one_more_scout_than_bombs_per_segment)
-s.add(no_scout_threatens_another_scout)
-s.add(at_most_six_bombs_in_red_setup)
-s.add(at_most_six_bombs_in_blu_setup)
-
-# Objective
-max_scouts = 24
-num_scouts = PbEq([ (is_scout[r][c], 1) for (r, c) in board() ], max_scouts)
-s.add(num_scouts)
-
-if s.check() == sat:
-    print("Maximum number of scouts satisfying constraints == %s." % max_scouts)
-    print(diagram(s.model()))
-else:
-    print("Z3 failed to find a solution.")
+        for (r, c) in stratego.open_squares()
+    ]
+
+# Chained encoding: visible[i] == there is a scout before the i-th square of a segment that is not blocked by a bomb (linear along each segment).
+# The visibility variables only need to be forced upward, since they only occur negatively in the threat constraints.
+def chained(is_scout, is_bomb):
+    constraints = []
+    for k, segment in enumerate(segments):
+        visible = [ Bool("visible_%s_%s" % (k, i)) for i in range(len(segment)) ]
+        constraints.append(Not(visible[0]))
+        for i, (r, c) in enumerate(segment):
+            constraints.append(Implies(is_scout[r][c], Not(visible[i])))
+            if i + 1 < len(segment):
+                constraints.append(Implies(Or(is_scout[r][c], And(visible[i], Not(is_bomb[r][c]))), visible[i + 1]))
+    return constraints
+
+# Lazy encoding: no threat constraints up front. The search adds the pairwise ones that its models violate (see violated).
+def lazy(is_scout, is_bomb):
+    return []
+
+encodings = { 'pairwise': pairwise, 'chained': chained, 'lazy': lazy }
+
+# The pairwise threat constraints of the segments on which a model has two scouts without a bomb between them. Adding all pairs
+# of such a segment takes 2 to 11 rounds for puzzle VI, against 50 to 80 rounds when adding only the violated pairs.
+def violated(grids):
+    is_scout, is_bomb, terms = grids['scouts'], grids['bombs'], { name: packed(grid) for name, grid in grids.items() }
+
+    def cut(a, b):
+        (ra, ca), (rb, cb) = a, b
+        return Implies(And(is_scout[ra][ca], is_scout[rb][cb]), threat_blocked(is_bomb, a, b))
+
+    def refine(m):
+        p = pieces(stratego, m, grids, terms)
+        hit = sorted({ k for k, _, _ in stratego.threats(p['scouts'], p['bombs']) })
+        return [ cut(a, b) for k in hit for i, a in enumerate(segments[k]) for b in segments[k][i + 1:] ]
+    return refine
+
+# The bomb budget of the red and blue setup areas, from a single budget for both or a (red, blue) pair
+def budgets(budget):
+    return tuple(budget) if isinstance(budget, (tuple, list)) else (budget, budget)
+
+# The finite-domain solver bit-blasts to its SAT core with native cardinality constraints, which is orders of magnitude faster here.
+# Without a budget, the number of bombs is left open (see guarded).
+def model(solver='fd', symmetry=False, order=None, cardinality='native', encoding='chained', budget=6, lap=None):
+    lap = lap or laps()
+
+    # Variables
+    is_scout = variables(stratego, 'is_scout')
+    is_bomb  = variables(stratego, 'is_bomb')
+    lap('variables')
+
+    # Piece placement
+    no_scouts_and_bombs_on_same_square = [ Not(And(is_scout[r][c], is_bomb[r][c])) for (r, c) in board() ]
+    no_scouts_or_bombs_in_lakes = [ Not(Or(is_scout[r][c], is_bomb[r][c])) for (r, c) in lakes() ]
+    no_bombs_in_dmz = [ Not(is_bomb[r][c]) for (r, c) in dmz() ]
+    red, blue = budgets(budget) if budget is not None else (None, None)
+    at_most_red_budget_bombs_in_red_setup = at_most([ is_bomb[r][c] for (r, c) in red_setup() ], red, cardinality) if red is not None else []
+    at_most_blue_budget_bombs_in_blu_setup = at_most([ is_bomb[r][c] for (r, c) in blu_setup() ], blue, cardinality) if blue is not None else []
+
+    # The number of scouts minus the number of bombs is at most one on each segment, or equivalently,
+    # the number of scouts plus the number of squares without a bomb is at most the length of the segment plus one
+    at_most_one_more_scout_than_bombs_per_segment = [
+        constraint
+        for s in segments
+        for constraint in at_most([ is_scout[r][c] for (r, c) in s ] + [ Not(is_bomb[r][c]) for (r, c) in s ], len(s) + 1, cardinality)
+    ]
+
+    no_scout_threatens_another_scout = encodings[encoding](is_scout, is_bomb)
+
+    # Clauses
+    s = solvers[solver]()
+    add(s,
+        no_scouts_and_bombs_on_same_square +
+        no_scouts_or_bombs_in_lakes +
+        no_bombs_in_dmz +
+        at_most_one_more_scout_than_bombs_per_segment +
+        no_scout_threatens_another_scout +
+        at_most_red_budget_bombs_in_red_setup +
+        at_most_blue_budget_bombs_in_blu_setup,
+        order
+    )
+
+    # Symmetry breaking
+    if symmetry:
+        s.add(symmetry_breaking(stratego, [ is_scout, is_bomb ]))
+
+    lap('constraints')
+    return s, { 'scouts': is_scout, 'bombs': is_bomb }
+
+# Place exactly the given number of scouts, or maximize the number of scouts if none is given.
+# Objective: each row segment holds at most one more scout than it has bombs
+def solve(scouts=None, **kwargs):
+    upper = len(stratego.row_masks) + sum(budgets(kwargs.get('budget', 6)))
+    return solution(__name__, stratego, 'scouts', 'max', upper, refined=kwargs.get('encoding') == 'lazy', count=scouts, **kwargs)
+
+# Sweep of the maximum number of scouts over the bomb budgets of the two setup areas. Each worker process solves points
+# (red, blue) on a single incremental solver without budgets, under the assumption literals of the budgets of the point,
+# so that it keeps its learned clauses from one point to the next. The maximum is monotone in both budgets: a solution of a
+# point is one of the points with larger budgets, and warm starts their search. Conversely, removing a bomb merges two
+# compartments on its row and two on its column, which costs at most two scouts: a point has at most two more scouts than
+# a point with one bomb less. The vertical reflection swaps the setup areas, so that only the points with red <= blue are
+# solved, and the others are their mirror images.
+
+# Assumption literals for the budgets 0 to limit of each setup area, where each budget implies the larger ones.
+# The budgets are native pseudo-Boolean constraints, since the other encodings define auxiliary variables for a single bound.
+def guarded(is_bomb, limit):
+    constraints, literals = [], {}
+    for side, squares in (('red', red_setup()), ('blu', blu_setup())):
+        literals[side] = [ Bool("at_most_%s_bombs_in_%s_setup" % (n, side)) for n in range(limit + 1) ]
+        constraints += [ Implies(lit, And(at_most([ is_bomb[r][c] for (r, c) in squares ], n))) for n, lit in enumerate(literals[side]) ]
+        constraints += [ Implies(a, b) for a, b in zip(literals[side], literals[side][1:]) ]
+    return constraints, literals
+
+# The incremental solver of a worker process of the sweep
+incremental = {}
+
+def sweeper(limit, seed, params, options):
+    configure(seed, params)
+    s, grids = model(budget=None, **options)
+    constraints, literals = guarded(grids['bombs'], limit)
+    s.add(constraints)
+    incremental.update(solver=s, grids=grids, literals=literals, options=options)
+
+# Maximize the scouts of a point between its bounds, starting from the hinted pieces of a point with smaller budgets
+def point(task):
+    red, blue, lower, upper, hint = task
+    s, grids, literals, options = incremental['solver'], incremental['grids'], incremental['literals'], incremental['options']
+    start = time.perf_counter()
+    verdict, m = optimize(
+        s, [ grids['scouts'][r][c] for (r, c) in board() ], 'max', lower, upper,
+        encoding=options.get('cardinality', 'native'),
+        refine=violated(grids) if options.get('encoding') == 'lazy' else None,
+        hint=[ grid[r][c] for name, grid in grids.items() for (r, c) in stratego.squares_of(hint.get(name, 0)) ],
+        assumptions=[ literals['red'][red], literals['blu'][blue] ]
+    )
+    return red, blue, verdict, pieces(stratego, m, grids) if m is not None else {}, time.perf_counter() - start
+
+# Point q has at most the budgets of point p, directly or as mirror images. Returns the number of bombs between them, or None.
+def below(q, p):
+    distances = [ (p[0] - a) + (p[1] - b) for (a, b) in (q, q[::-1]) if a <= p[0] and b <= p[1] ]
+    return min(distances) if q != p and distances else None
+
+def mirrored(witness):
+    perm = reflections(stratego)['V']
+    return { name: image(perm, b) for name, b in witness.items() }
+
+# Bounds of a point from the points with smaller budgets that are done, and the pieces of the best of them
+def bracketed(p, done):
+    lower, upper, hint = 0, min(len(stratego.row_masks), len(stratego.col_masks)) + sum(p), {}
+    for q, (verdict, value, witness, _, _) in done.items():
+        d = below(q, p)
+        if d is None or value is None:
+            continue
+        if value > lower:
+            lower, hint = value, witness if q[0] <= p[0] and q[1] <= p[1] else mirrored(witness)
+        if verdict == 'sat':
+            upper = min(upper, value + 2 * d)
+    return lower, upper, hint
+
+# Solve the points in parallel, each as soon as the points with smaller budgets are done. Returns the verdict, number of
+# scouts, pieces, seconds and source (solved, bounds or mirror) of each point.
+def sweep(points, jobs=1, seed=0, params=(), log=None, **options):
+    limit = max(max(p) for p in points)
+    canonical = sorted({ (min(p), max(p)) for p in points })
+    done, waiting, running, finished = {}, list(canonical), set(), queue.Queue()
+
+    def record(p, verdict, witness, seconds, source):
+        done[p] = (verdict, popcount(witness['scouts']) if witness else None, witness, seconds, source)
+        if log:
+            log('point', red=p[0], blue=p[1], value=done[p][1], verdict=verdict, source=source, seconds=seconds)
+
+    with multiprocessing.Pool(jobs, initializer=sweeper, initargs=(limit, seed, list(params), options)) as pool:
+        while waiting or running:
+            for p in [ p for p in waiting if not any(below(q, p) is not None for q in waiting + list(running)) ]:
+                waiting.remove(p)
+                lower, upper, hint = bracketed(p, done)
+                if lower == upper:
+                    record(p, 'sat', hint, 0.0, 'bounds')
+                    continue
+                running.add(p)
+                pool.apply_async(point, ((p[0], p[1], lower, upper, hint), ), callback=finished.put, error_callback=finished.put)
+            if not running:
+                continue
+            message = finished.get()
+            if isinstance(message, Exception):
+                raise message
+            red, blue, verdict, witness, seconds = message
+            running.remove((red, blue))
+            record((red, blue), verdict, witness, seconds, 'solved')
+
+    return {
+        p: done[p] if p in done else done[p[::-1]][:2] + (mirrored(done[p[::-1]][2]), 0.0, 'mirror')
+        for p in points
+    }
+
+def sweeping(args):
+    k = range(args.sweep + 1)
+    points = [ (n, n) for n in k ] if args.symmetric else [ (red, blue) for red in k for blue in k ]
+    start = time.perf_counter()
+    results = sweep(
+        points, args.jobs, args.seed, [ (key, value) for key, value in args.param ], Log(args.log) if args.log or args.progress is not None else None,
+        solver=args.solver, order=args.order, cardinality=args.cardinality, encoding=args.encoding
+    )
+    print("Swept %s points in %.2f seconds." % (len(points), time.perf_counter() - start))
+
+    print("%4s%6s%8s%10s%10s%10s" % ('red', 'blue', 'scouts', 'bombs', 'verdict', 'source'))
+    for (red, blue), (verdict, value, witness, seconds, source) in results.items():
+        assert not witness or verified('scout_bomb_independence', witness, budget=(red, blue))
+        bombs = "%s+%s" % (popcount(witness['bombs'] & stratego.red_setup), popcount(witness['bombs'] & stratego.blu_setup)) if witness else '-'
+        print("%4s%6s%8s%10s%10s%10s" % (red, blue, value, bombs, verdict, source))
+        if args.diagrams and witness:
+            print(diagram(stratego, witness))
+
+    # The maximum number of scouts with the red budgets as rows and the blue budgets as columns
+    if not args.symmetric:
+        print("\n%8s " % 'red\\blue' + ''.join("%4s" % blue for blue in k))
+        for red in k:
+            print("%8s " % red + ''.join("%4s" % results[(red, blue)][1] for blue in k))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump([
+                { 'red': red, 'blue': blue, 'verdict': verdict, 'scouts': value, 'pieces': witness, 'seconds': seconds, 'source': source }
+                for (red, blue), (verdict, value, witness, seconds, source) in results.items()
+            ], f, indent=4)
+
+def main():
+    parser = add_arguments(argparse.ArgumentParser(description=title()), 'fd')
+    parser.add_argument('--scouts', type=int, default=None, help="number of scouts to place (24 is feasible, 25 is not); maximize if omitted")
+    parser.add_argument('--cuts', action='store_true', help="add the cuts that cores.py derived from the UNSAT cores of sub-boards")
+    parser.add_argument('--encoding', choices=list(encodings), default='chained', help="encoding of the scout threats along each segment, or lazy to add them for the segments that the models violate")
+    parser.add_argument('--budget', type=int, nargs='+', default=[ 6 ], metavar='BOMBS', help="bombs per setup area, or for the red and the blue setup area")
+    parser.add_argument('--sweep', type=int, nargs='?', const=12, default=None, metavar='LIMIT', help="maximize the scouts for all budgets up to LIMIT (default 12) bombs per setup area")
+    parser.add_argument('--symmetric', action='store_true', help="sweep only the equal budgets of both setup areas")
+    parser.add_argument('--jobs', type=int, default=1, help="number of worker processes of the sweep")
+    parser.add_argument('--output', default=None, metavar='FILE', help="write the witnesses of the sweep as JSON to this file")
+    parser.add_argument('--diagrams', action='store_true', help="print the witness of each point of the sweep")
+    args = parser.parse_args()
+    if len(args.budget) > 2:
+        parser.error("--budget takes one or two numbers of bombs")
+    budget = args.budget[0] if len(args.budget) == 1 or args.budget[0] == args.budget[1] else tuple(args.budget)
+    if args.symmetry and (args.sweep is not None or isinstance(budget, tuple)):
+        parser.error("--symmetry needs equal budgets of both setup areas")
+    if args.sweep is not None and (args.scouts is not None or args.solver == 'optimize'):
+        parser.error("--sweep maximizes the scouts on an incremental solver, and excludes --scouts and --solver optimize")
+
+    print(title(budget, args.sweep))
+    if args.sweep is not None:
+        sweeping(args)
+        return
+    result = solve(scouts=args.scouts, encoding=args.encoding, budget=budget, cuts=args.cuts, **options(args))
+    if result.verdict == 'sat':
+        assert verified('scout_bomb_independence', result.pieces, budget=budget)
+        print("%s number of scouts satisfying constraints == %s." % ("Feasible" if args.scouts is not None else "Maximum", result.value))
+        print(diagram(stratego, result.pieces))
+    elif result.verdict == 'unsat':
+        print("No placement of %s scouts satisfies the constraints." % (args.scouts if args.scouts is not None else 'any'))
+    else:
+        print("Z3 failed to find a solution.")
+
+if __name__ == '__main__':
+    main()
@@ -5,131 +5,127 @@
 #    (See accompanying file LICENSE_1_0.txt or copy at
 #          http://www.boost.org/LICENSE_1_0.txt)
 
-from itertools import chain, product, repeat
-import numpy as np
-from z3 import Bool, Implies, Not, PbEq, PbLe, sat, Solver
+import argparse
+from z3 import And, Bool, Implies, Not, Or
 
-# Stratego board
-H, W =  10, 10
-
-def board():
-    return product(range(H), range(W))
-
-def lakes():
-    return product(range(4, 6), chain(range(2, 4), range(6, 8)))
+from cardinality import at_most, exactly
+from catalog import diagram
+from geometry import stratego
+from puzzle import add, add_arguments, laps, options, solution, solvers, variables
+from symmetry import symmetry_breaking
+from verify import verified
 
-# Board display
-def piece(m, r, c):
-    return '#' if (r, c) in lakes() else '2' if m.evaluate(is_scout[r][c]) else '.'
-
-def diagram(model):
-    b = np.array([ piece(model, r, c) for (r, c) in board() ]).reshape(H, W)
-    return "%s" % '\n'.join(map(lambda row: ' '.join(map(str, row)), b))
+# Stratego board
+area = stratego
+H, W = stratego.H, stratego.W
+board, lakes = stratego.board, stratego.lake_squares
+segments, scout_moves_from = stratego.segments, stratego.scout_moves_from
 
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=11670
 # http://forum.stratego.com/topic/1134-stratego-quizz-and-training-forum/?p=457225
-print("The maximum number of scouts on a Stratego board such that each scout threatens exactly one other scout.")
-
-# Variables
-is_scout = np.array([ Bool("is_scout_%s%s" % (r, c)) for (r, c) in board() ]).reshape(H, W).tolist()
-
-# Piece placement
-no_scouts_in_lakes = [ Not(is_scout[r][c]) for (r, c) in lakes() ]
-
-# Segments
-open_rows = [ list(zip(repeat(r), range(W))) for r in chain(range(0, 4), range(6, H)) ]
-open_cols = [ list(zip(range(H), repeat(c))) for c in chain(range(0, 2), range(4, 6), range(8, W)) ]
-lake_rows = [ list(zip(repeat(r), range(c, c + 2))) for r in range(4, 6) for c in (0, 4, 8) ]
-lake_cols = [ list(zip(range(r, r + 4), repeat(c))) for r in (0, 6) for c in chain(range(2, 4), range(6, 8)) ]
-segments = open_rows + open_cols + lake_rows + lake_cols
-
-at_most_two_scouts_per_segment = [
-    PbLe([
-        (is_scout[r][c], 1)
-        for (r, c) in s
-    ], 2)
-    for s in segments
-]
-
-# Scout moves in the left (L), right (R), downward (D) and upward (U) directions
-def L_scout_moves_from(r, c):
-    if r in chain(range(0, 4), range(6, H)):
-        return range(0, c)
-    elif c in range(0, 2):
-        return range(0, c)
-    elif c in range(4, 6):
-        return range(4, c)
-    elif c in range(8, W):
-        return range(8, c)
+title = "The maximum number of scouts on a Stratego board such that each scout threatens exactly one other scout."
+
+# Grid of pieces whose number is optimized
+objective = 'scouts'
+
+# Threat encoding: each scout has exactly one other scout among the squares it can move to
+def threats(is_scout, cardinality):
+    return [
+        Implies(
+            is_scout[r][c],
+            And(exactly([
+                is_scout[dr][dc]
+                for (dr, dc) in scout_moves_from[r][c]
+            ], 1, cardinality))
+        )
+        for (r, c) in stratego.open_squares()
+    ]
+
+# Pairs of squares whose scouts would threaten each other, with one variable per pair
+def pairs():
+    return {
+        (a, b): Bool("is_pair_%s_%s" % (stratego.square(*a), stratego.square(*b)))
+        for a in stratego.open_squares()
+        for b in scout_moves_from[a[0]][a[1]]
+        if a < b
+    }
+
+# Pair encoding: the scouts are the squares of the chosen pairs, and each segment holds the squares of at most one chosen pair.
+# A pair on a row segment then uses up that row segment and the column segments of both its squares, so that each scout
+# is in exactly one pair and threatens only its partner. This is a set packing of the pairs by the segments: the number of
+# scouts is twice the number of pairs, which makes the parity structural, so that the pairs can be maximized directly.
+def pairing(is_scout, cardinality):
+    is_pair = pairs()
+    incident = { sq: [ p for (a, b), p in is_pair.items() if sq in (a, b) ] for sq in stratego.open_squares() }
+
+    scouts_are_in_a_pair = [
+        is_scout[r][c] == Or(incident[(r, c)])
+        for (r, c) in stratego.open_squares()
+    ]
+
+    segments_are_used_by_at_most_one_pair = [
+        constraint
+        for s in segments
+        for constraint in at_most([ p for (a, b), p in is_pair.items() if a in s or b in s ], 1, cardinality)
+    ]
+
+    return scouts_are_in_a_pair + segments_are_used_by_at_most_one_pair
+
+encodings = { 'threats': threats, 'pairs': pairing }
+
+# Optimize() takes too long on the threat encoding because it does not recognize that the number of scouts has to be even.
+# The finite-domain solver keeps using its SAT core with native cardinality constraints under assumptions.
+# The pair encoding makes the parity explicit, and can be maximized directly.
+def model(solver='fd', symmetry=False, order=None, cardinality='native', encoding='threats', lap=None):
+    lap = lap or laps()
+
+    # Variables
+    is_scout = variables(stratego, 'is_scout')
+    lap('variables')
+
+    # Piece placement
+    no_scouts_in_lakes = [ Not(is_scout[r][c]) for (r, c) in lakes() ]
+
+    at_most_two_scouts_per_segment = [
+        constraint
+        for s in segments
+        for constraint in at_most([ is_scout[r][c] for (r, c) in s ], 2, cardinality)
+    ]
+
+    scouts_threaten_exactly_one_other_scout = encodings[encoding](is_scout, cardinality)
+
+    # Clauses
+    s = solvers[solver]()
+    add(s, no_scouts_in_lakes + at_most_two_scouts_per_segment + scouts_threaten_exactly_one_other_scout, order)
+
+    # Symmetry breaking
+    if symmetry:
+        s.add(symmetry_breaking(stratego, [ is_scout ]))
+
+    lap('constraints')
+    return s, { 'scouts': is_scout }
+
+# Objective: each scout is paired with exactly one other scout, so only even numbers of scouts need to be checked.
+# Each scout lies on two segments, and each segment has at most two scouts.
+# With the pair encoding, the objective is twice the number of pairs.
+def solve(**kwargs):
+    literals, weight = (list(pairs().values()), 2) if kwargs.get('encoding') == 'pairs' else (None, 1)
+    return solution(__name__, stratego, 'scouts', 'max', len(segments) // 2 * 2, literals=literals, weight=weight, step=2, **kwargs)
+
+def main():
+    parser = add_arguments(argparse.ArgumentParser(description=title), 'fd')
+    parser.add_argument('--cuts', action='store_true', help="add the cuts that cores.py derived from the UNSAT cores of sub-boards")
+    parser.add_argument('--encoding', choices=list(encodings), default='threats', help="encoding of the scout threats, or pairs to maximize the number of threatening pairs (e.g. with --solver optimize)")
+    args = parser.parse_args()
+
+    print(title)
+    result = solve(encoding=args.encoding, cuts=args.cuts, **options(args))
+    if result.verdict == 'sat':
+        assert verified('scout_cover', result.pieces)
+        print("The maximum number of scouts satisfying the constraints == %s." % result.value)
+        print(diagram(stratego, result.pieces))
     else:
-        return range(0)
-
-def R_scout_moves_from(r, c):
-    if r in chain(range(0, 4), range(6, H)):
-        return range(c + 1, W)
-    elif c in range(0, 2):
-        return range(c + 1, 2)
-    elif c in range(4, 6):
-        return range(c + 1, 6)
-    elif c in range(8, W):
-        return range(c + 1, W)
-    else:
-        return range(0)
-
-def D_scout_moves_from(r, c):
-    if c in chain(range(0, 2), range(4, 6), range(8, W)):
-        return range(0, r)
-    elif r in range(0, 4):
-        return range(0, r)
-    elif r in range(6, H):
-        return range(6, r)
-    else:
-        return range(0)
-
-def U_scout_moves_from(r, c):
-    if c in chain(range(0, 2), range(4, 6), range(8, W)):
-        return range(r + 1, H)
-    elif r in range(0, 4):
-        return range(r + 1, 4)
-    elif r in range(6, H):
-        return range(r + 1, H)
-    else:
-        return range(0)
-
-scout_moves_from = np.array([
-    list(chain(
-        zip(repeat(r), L_scout_moves_from(r, c)),
-        zip(repeat(r), R_scout_moves_from(r, c)),
-        zip(D_scout_moves_from(r, c), repeat(c)),
-        zip(U_scout_moves_from(r, c), repeat(c))
-    ))
-    for (r, c) in board()
-]).reshape(H, W)
-
-scouts_threaten_exactly_one_other_scout = [
-    Implies(
-        is_scout[r][c],
-        PbEq([
-            (is_scout[dr][dc], 1)
-            for (dr, dc) in scout_moves_from[r, c]
-        ], 1)
-    )
-    for (r, c) in board() if (r, c) not in lakes()
-]
-
-# Clauses (Optimize() takes too long on this problem, Solver() will proof max_scouts = 18 instantly, and disproof max_scouts = 20 within a minute)
-s = Solver()
-s.add(no_scouts_in_lakes)
-s.add(at_most_two_scouts_per_segment)
-s.add(scouts_threaten_exactly_one_other_scout)
-
-# Objective
-max_scouts = 20
-num_scouts = PbEq([ (is_scout[r][c], 1) for (r, c) in board() ], max_scouts)
-s.add(num_scouts)
-
-if s.check() == sat:
-    print("The maximum number of scouts satisfying the constraints == %s." % max_scouts)
-    print(diagram(s.model()))
-else:
-    print("Z3 failed to find a solution.")
+        print("Z3 failed to find a solution.")
+
+if __name__ == '__main__':
+    main()
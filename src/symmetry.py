@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+from z3 import And, Bool, Implies
+
+# Horizontal (H), vertical (V) and combined (HV) reflections of the board
+def reflections(board):
+    H, W = board.H, board.W
+    return {
+        'H':  [ board.square(r, W - 1 - c)         for (r, c) in board.squares ],
+        'V':  [ board.square(H - 1 - r, c)         for (r, c) in board.squares ],
+        'HV': [ board.square(H - 1 - r, W - 1 - c) for (r, c) in board.squares ]
+    }
+
+def image(perm, b):
+    return sum(1 << perm[sq] for sq in range(len(perm)) if b >> sq & 1)
+
+# Reflections that map the lakes, the setup areas (as a whole) and the DMZ onto themselves
+def symmetries(board):
+    return {
+        name: perm
+        for name, perm in reflections(board).items()
+        if all(
+            image(perm, b) == b
+            for b in (board.lakes, board.red_setup | board.blu_setup, board.dmz)
+        )
+    }
+
+# Lex-leader constraint x <=_lex perm(x) over the squares of all grids, in row-major order and grid by grid.
+# Since each reflection is an involution, the positions i with perm(i) < i are implied by the earlier
+# positions being equal, and only the positions with perm(i) > i need to be compared.
+def lex_leader(board, grids, perm, name):
+    x = [ grid[r][c] for grid in grids for (r, c) in board.squares ]
+    y = [ grid[r][c] for grid in grids for (r, c) in map(board.coordinates, perm) ]
+    n = len(board.squares)
+    pairs = [ (x[i], y[i]) for i in range(len(x)) if perm[i % n] > i % n ]
+
+    # eq[i] == all of the first i pairs are equal
+    eq = [ Bool("lex_%s_%s" % (name, i)) for i in range(len(pairs)) ]
+    return [ eq[0] ] + [
+        Implies(eq[i], Implies(xi, yi))
+        for i, (xi, yi) in enumerate(pairs)
+    ] + [
+        Implies(And(eq[i], xi == yi), eq[i + 1])
+        for i, (xi, yi) in enumerate(pairs[:-1])
+    ]
+
+# Keep only the lexicographically smallest member of each orbit of solutions under the board symmetries
+def symmetry_breaking(board, grids):
+    return [
+        constraint
+        for name, perm in symmetries(board).items()
+        for constraint in lex_leader(board, grids, perm, name)
+    ]
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from itertools import product
+
+from geometry import bits, popcount, setup_area
+
+# Transfer-matrix dynamic programming over the columns of a strip of the given height and width. After each column, the state holds
+# for each band of rows spanned by a window the number of columns since its last bomb, capped at the widest window of its height.
+# A window that ends in a column has a bomb if and only if the gap of its band is smaller than its width. The number of states
+# does not depend on the width of the strip, so the run time is linear in it.
+# Returns the minimum number of bombs, the number of optimal layouts, and the first optimal layout as a bitboard.
+def transfer_matrix(windows, height=setup_area.H, width=setup_area.W):
+    windows = [ (h, w) for (h, w) in windows if h <= height and w <= width ]
+    caps = { h: max(w for (hh, w) in windows if hh == h) for (h, _) in windows }
+    bands = [ (sum(1 << (r + dr) for dr in range(h)), h) for h in sorted(caps) for r in range(height - h + 1) ]
+
+    # The gap of each band has to be smaller than the narrowest window of its height that ends in the current column
+    def limits(c):
+        return tuple(min([ w for (hh, w) in windows if hh == h and w - 1 <= c ], default=None) for (_, h) in bands)
+
+    def transitions(state, limit):
+        for pattern in range(1 << height):
+            gaps = tuple(0 if pattern & mask else min(g + 1, caps[h]) for g, (mask, h) in zip(state, bands))
+            if all(m is None or g < m for g, m in zip(gaps, limit)):
+                yield pattern, gaps
+
+    # Each layer maps a state to the minimum number of bombs, the number of layouts attaining it, and a back pointer
+    memo = {}
+    layers = [ { tuple(caps[h] for (_, h) in bands): (0, 1, None) } ]
+    for c in range(width):
+        limit, layer = limits(c), {}
+        for state, (bombs, count, _) in layers[-1].items():
+            if (state, limit) not in memo:
+                memo[state, limit] = list(transitions(state, limit))
+            for pattern, gaps in memo[state, limit]:
+                n, best = bombs + popcount(pattern), layer.get(gaps)
+                if best is None or n < best[0]:
+                    layer[gaps] = (n, count, (state, pattern))
+                elif n == best[0]:
+                    layer[gaps] = (n, best[1] + count, best[2])
+        layers.append(layer)
+
+    min_bombs = min(bombs for (bombs, _, _) in layers[-1].values())
+    num_layouts = sum(count for (bombs, count, _) in layers[-1].values() if bombs == min_bombs)
+    state, layout = next(state for state, (bombs, _, _) in layers[-1].items() if bombs == min_bombs), 0
+    for c in reversed(range(width)):
+        state, pattern = layers[c + 1][state][2]
+        layout |= sum(1 << (r * width + c) for r in bits(pattern))
+    return min_bombs, num_layouts, layout
+
+# The minimum number of bombs and the number of optimal layouts by trying all layouts of the strip, for checking on small strips
+def exhaustive(windows, height, width):
+    rectangles = [
+        sum(1 << ((r + dr) * width + c + dc) for dr in range(h) for dc in range(w))
+        for (h, w) in windows if h <= height and w <= width
+        for r in range(height - h + 1) for c in range(width - w + 1)
+    ]
+    feasible = [ popcount(layout) for layout in range(1 << (height * width)) if all(layout & m for m in rectangles) ]
+    return min(feasible), feasible.count(min(feasible)), rectangles
+
+def selfcheck(height=3, width=6):
+    failures = []
+    for windows in [ [ (1, 1) ], [ (1, 2) ], [ (2, 2) ], [ (2, 1), (1, 3) ], [ (2, 3), (3, 2) ], [ (2, 3), (3, 2), (1, 4) ] ]:
+        for h, w in product(range(1, height + 1), range(1, width + 1)):
+            min_bombs, num_layouts, layout = transfer_matrix(windows, h, w)
+            expected, expected_layouts, rectangles = exhaustive(windows, h, w)
+            if (min_bombs, num_layouts) != (expected, expected_layouts) or popcount(layout) != min_bombs or not all(layout & m for m in rectangles):
+                failures.append((windows, h, w, (min_bombs, num_layouts), (expected, expected_layouts)))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfer-matrix dynamic programming for the minimum number of bombs of puzzles I and II.")
+    parser.add_argument('--check', action='store_true', help="check the minimum and the number of optimal layouts against exhaustive search on strips of up to 3x6 squares instead")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = selfcheck()
+        for windows, h, w, found, expected in failures:
+            print("%s on a %sx%s strip: %s bombs in %s layouts instead of %s in %s" % (windows, h, w, *found, *expected))
+        print("The dynamic program agrees with exhaustive search." if not failures else "%s failures." % len(failures))
+        raise SystemExit(1 if failures else 0)
+
+    for puzzle, windows in [ ('I', [ (2, 3), (3, 2) ]), ('II', [ (2, 3), (3, 2), (1, 6) ]) ]:
+        min_bombs, num_layouts, _ = transfer_matrix(windows)
+        print("Puzzle %s: %s bombs, in %s optimal layouts" % (puzzle, min_bombs, num_layouts))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from importlib import import_module
+from inspect import signature
+import json
+import multiprocessing
+import os
+import random
+from statistics import mean
+import time
+from z3 import get_param, get_version_string
+
+from puzzle import profiles, puzzles
+
+# Values of the Z3 parameters that plausibly matter for the puzzles
+values = {
+    'sat.cardinality.solver': [ True, False ],
+    'sat.pb.solver':          [ 'solver', 'circuit', 'sorting', 'totalizer', 'binary_merge', 'segmented' ],
+    'sat.threads':            [ 1, 2, 4 ],
+    'smt.arith.solver':       [ 2, 6 ],
+    'opt.maxsat_engine':      [ 'maxres', 'wmax', 'pd-maxres' ],
+    'opt.priority':           [ 'lex', 'box' ],
+    'opt.enable_sat':         [ True, False ]
+}
+
+# The same values with the default of the installed Z3 first, so that the baseline cannot drift from it
+def defaults_first(values):
+    space = { key: sorted(vs, key=lambda v: str(v).lower() != get_param(key)) for key, vs in values.items() }
+    assert all(str(vs[0]).lower() == get_param(key) for key, vs in space.items())
+    return space
+
+space = defaults_first(values)
+
+# Parameters that each solver uses: the finite-domain solver runs the SAT core, the default solver the SMT core,
+# and the optimizer both, next to its own engines
+relevant = {
+    'fd':       [ 'sat.' ],
+    'default':  [ 'smt.', 'sat.' ],
+    'optimize': [ 'opt.', 'smt.', 'sat.' ]
+}
+
+# The solver that a puzzle is solved with by default, from the signature of its model
+def default_solver(module):
+    return signature(import_module(module).model).parameters['solver'].default
+
+# Random configurations that differ from the defaults in one or more relevant parameters, after the defaults themselves
+def sample(solver, n, rng):
+    keys = [ key for key in space if any(key.startswith(prefix) for prefix in relevant[solver]) ]
+    configs = [ () ]
+    for _ in range(100 * n):
+        if len(configs) == n:
+            break
+        config = tuple((key, value) for key in keys for value in [ rng.choice(space[key]) ] if value != space[key][0])
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+def run(task):
+    puzzle, params, seed = task
+    module, kwargs = puzzles[puzzle]
+    start = time.perf_counter()
+    result = import_module(module).solve(seed=seed, params=list(params), **kwargs)
+    return result.verdict, result.value, time.perf_counter() - start
+
+# Solve a puzzle in a fresh process that is terminated when it runs out of time. Returns None for a time out.
+def timed(puzzle, params, seed, timeout):
+    with multiprocessing.Pool(1) as pool:
+        try:
+            verdict, value, elapsed = pool.apply_async(run, ((puzzle, params, seed), )).get(timeout)
+        except multiprocessing.TimeoutError:
+            return None
+    return (value, elapsed) if verdict == 'sat' else None
+
+# Successive halving: run all configurations with a short time limit, keep the fastest 1 / eta of them, and repeat with
+# eta times the time limit, until one remains or the budget is spent. Each configuration runs with several seeds, since the
+# solve times of a single seed vary widely, and scores the mean time with twice the limit for a time out (PAR-2).
+# The defaults run in every round, so that the winner is compared with them under the same time limit.
+# A configuration that finds a different optimum than the first one is wrong, and is dropped.
+def halving(puzzle, configs, budget, seeds=2, limit=1.0, eta=3, report=None):
+    deadline = time.monotonic() + budget
+    survivors, optimum = list(configs), None
+    while True:
+        ranked, scores = [], {}
+        for config in survivors:
+            if time.monotonic() > deadline:
+                break
+            times = []
+            for seed in range(seeds):
+                outcome = timed(puzzle, config, seed, limit)
+                if outcome is not None:
+                    value, elapsed = outcome
+                    optimum = value if optimum is None else optimum
+                    if value != optimum:
+                        break
+                times.append(2 * limit if outcome is None else elapsed)
+            else:
+                scores[config] = mean(times)
+                ranked.append(config)
+                if report:
+                    report(config, limit, scores[config])
+        ranked.sort(key=scores.get)
+        best = ranked[:max(1, len(ranked) // eta)]
+        best += [ () ] if () in ranked and () not in best else []
+        if len(best) <= 1 or len(best) == len(ranked) or time.monotonic() > deadline:
+            return ranked[0] if ranked else None, scores
+        survivors, limit = best, limit * eta
+
+def store(puzzle, solver, params, seconds, baseline):
+    os.makedirs(profiles, exist_ok=True)
+    path = os.path.join(profiles, "%s.json" % puzzle)
+    with open(path, 'w') as f:
+        json.dump({
+            'puzzle':   puzzle,
+            'solver':   solver,
+            'params':   [ list(p) for p in params ],
+            'seconds':  seconds,
+            'baseline': baseline,
+            'z3':       get_version_string()
+        }, f, indent=4)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the Z3 parameters of the puzzles by successive halving over random configurations, and store the winners as profiles that the scripts load.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to tune (default: all)")
+    parser.add_argument('--budget', type=float, default=600, metavar='SECONDS', help="time budget per puzzle")
+    parser.add_argument('--samples', type=int, default=12, help="number of configurations, including the defaults")
+    parser.add_argument('--seeds', type=int, default=2, help="number of random seeds per configuration")
+    parser.add_argument('--limit', type=float, default=1.0, metavar='SECONDS', help="time limit of the first round")
+    parser.add_argument('--eta', type=int, default=3, help="keep 1 / eta of the configurations after each round")
+    parser.add_argument('--margin', type=float, default=0.9, help="keep the defaults unless the winner takes at most this fraction of their time")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the sampled configurations")
+    parser.add_argument('--dry-run', action='store_true', help="report the winners without storing them")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for puzzle in args.puzzles:
+        module, _ = puzzles[puzzle]
+        solver = default_solver(module)
+        configs = sample(solver, args.samples, rng)
+        print("Puzzle %s (%s solver): %s configurations" % (puzzle, solver, len(configs)))
+
+        def report(config, limit, score):
+            print("    %6.2f seconds (limit %s): %s" % (score, limit, ', '.join("%s=%s" % p for p in config) or 'defaults'), flush=True)
+
+        winner, scores = halving(puzzle, configs, args.budget, args.seeds, args.limit, args.eta, report)
+        if winner is None:
+            print("    No configuration solved the puzzle.")
+            continue
+        # The defaults ran under the same time limit in the last round, unless the budget ran out before them.
+        # A winner within the noise of the defaults is not worth a profile.
+        baseline = scores.get(())
+        if baseline is not None and scores[winner] > args.margin * baseline:
+            winner = ()
+        print("    Winner: %s (%.2f seconds, defaults %s)" % (', '.join("%s=%s" % p for p in winner) or 'defaults', scores[winner], "%.2f seconds" % baseline if baseline is not None else 'unknown'))
+        if not args.dry_run:
+            print("    Stored in %s" % store(puzzle, solver, winner, scores[winner], baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from functools import lru_cache
+from importlib import import_module
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from z3 import Not, sat
+
+from cardinality import encodings
+from geometry import setup_area, stratego
+from puzzle import configure, pieces, puzzles
+
+# Batches of candidate placements are NumPy Boolean arrays of shape (N, H * W), with column r * W + c for square (r, c),
+# the same layout as the bitboards. The checks below recompute the puzzle properties from the board geometry alone,
+# vectorized over the batch and independently of the Z3 encodings.
+
+def unpack(board, bitboards):
+    n = (board.H * board.W + 7) // 8
+    data = np.frombuffer(b''.join(b.to_bytes(n, 'little') for b in bitboards), dtype=np.uint8).reshape(-1, n)
+    return np.unpackbits(data, axis=1, count=board.H * board.W, bitorder='little').astype(bool)
+
+def mask(board, b):
+    return unpack(board, [ b ])[0]
+
+# Incidence matrix of the segments (rows) and the squares (columns)
+@lru_cache(maxsize=None)
+def incidence(board):
+    return unpack(board, board.segment_masks).astype(np.int32)
+
+# For each square, the number of pieces on its row and column segments (a piece on the square itself counts twice)
+def lines(board, pieces):
+    return (pieces.astype(np.int32) @ incidence(board).T) @ incidence(board)
+
+def inside(board, pieces, area):
+    return ~(pieces & ~mask(board, area)).any(axis=1)
+
+# No scout threatens another scout: at most one scout per segment
+def independent(board, scouts):
+    return inside(board, scouts, board.open) & ((scouts.astype(np.int32) @ incidence(board).T) <= 1).all(axis=1)
+
+# Each open square is occupied or threatened by a scout
+def dominating(board, scouts):
+    return inside(board, scouts, board.open) & (lines(board, scouts)[:, mask(board, board.open)] > 0).all(axis=1)
+
+# Each scout threatens exactly one other scout
+def paired(board, scouts):
+    return inside(board, scouts, board.open) & ((lines(board, scouts) == 3) | ~scouts).all(axis=1)
+
+# Each window of each shape has at least one bomb
+def covered(board, bombs, windows):
+    grid = bombs.reshape(-1, board.H, board.W)
+    return np.logical_and.reduce([
+        sliding_window_view(grid, (h, w), axis=(1, 2)).any(axis=(-2, -1)).all(axis=(1, 2))
+        for (h, w) in windows
+        if h <= board.H and w <= board.W
+    ] + [ np.ones(len(bombs), dtype=bool) ])
+
+# No scout threatens another scout, where bombs block the threats: the bombs split each segment into compartments,
+# numbered by the number of bombs before them, and each compartment holds at most one scout.
+# The budget of bombs is the same for both setup areas, or a (red, blue) pair.
+def separated(board, scouts, bombs, budget):
+    valid = inside(board, scouts, board.open) & inside(board, bombs, board.red_setup | board.blu_setup) & ~(scouts & bombs).any(axis=1)
+    for area, n in zip((board.red_setup, board.blu_setup), budget if isinstance(budget, (tuple, list)) else (budget, budget)):
+        valid &= bombs[:, mask(board, area)].sum(axis=1) <= n
+    for segment in board.segments:
+        squares = [ board.square(r, c) for (r, c) in segment ]
+        compartments = np.cumsum(bombs[:, squares], axis=1)
+        for k in range(len(squares) + 1):
+            valid &= (scouts[:, squares] & (compartments == k)).sum(axis=1) <= 1
+    return valid
+
+def bomb_domination(p, windows=((2, 3), (3, 2)), **_):
+    return covered(setup_area, p['bombs'], windows)
+
+def scout_domination(p, **_):
+    return dominating(stratego, p['scouts'])
+
+def scout_independence(p, **_):
+    return independent(stratego, p['scouts'])
+
+def scout_cover(p, **_):
+    return paired(stratego, p['scouts'])
+
+def scout_bomb_independence(p, budget=6, **_):
+    return separated(stratego, p['scouts'], p['bombs'], budget)
+
+checks = {
+    'bomb_domination':         (setup_area, bomb_domination),
+    'scout_domination':        (stratego, scout_domination),
+    'scout_independence':      (stratego, scout_independence),
+    'scout_cover':             (stratego, scout_cover),
+    'scout_bomb_independence': (stratego, scout_bomb_independence)
+}
+
+# Check a batch of candidates, given as a dict of bitboard lists (or of bitboards, for a single candidate)
+def verify(module, candidates, **kwargs):
+    board, check = checks[module]
+    return check({ name: unpack(board, b if isinstance(b, list) else [ b ]) for name, b in candidates.items() }, **kwargs)
+
+def verified(module, p, **kwargs):
+    return bool(verify(module, p, **kwargs)[0])
+
+# Random candidates with a density that sweeps from empty to half full, so that both valid and invalid ones occur
+def candidates(board, names, n, rng):
+    density = np.linspace(0, 0.5, n)[:, None]
+    return { name: rng.random((n, board.H * board.W)) < density for name in names }
+
+# Compare the Z3 encoding of a puzzle with the vectorized check on candidates fixed by assumptions. An encoding that
+# accepts an invalid candidate is wrong; one that rejects a valid candidate is stronger than the puzzle, which only
+# keeps the optimum if the optimal solutions satisfy the extra constraints.
+def fuzz(module, kwargs, p, valid, cardinality='native'):
+    configure(0)
+    s, grids = import_module(module).model(solver='fd', cardinality=cardinality, **kwargs)
+    literals = { name: [ x for row in grid for x in row ] for name, grid in grids.items() }
+    weaker, stronger = 0, 0
+    for i, v in enumerate(valid):
+        assumptions = [ x if p[name][i][sq] else Not(x) for name in grids for sq, x in enumerate(literals[name]) ]
+        accepted = s.check(assumptions) == sat
+        weaker += accepted and not v
+        stronger += v and not accepted
+    return weaker, stronger
+
+def main():
+    parser = argparse.ArgumentParser(description="Check random candidates against the puzzle constraints with vectorized NumPy code, and fuzz the Z3 encodings against these checks.")
+    parser.add_argument('puzzles', nargs='*', default=list(puzzles), help="puzzles to check (default: all)")
+    parser.add_argument('--samples', type=int, default=10000, help="number of random candidates to check")
+    parser.add_argument('--fuzz', type=int, default=200, help="number of candidates to also check with Z3")
+    parser.add_argument('--cardinality', choices=encodings, default='native', help="encoding of the cardinality constraints")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for puzzle in args.puzzles:
+        module, kwargs = puzzles[puzzle]
+        board, check = checks[module]
+        configure(args.seed)
+        s, grids = import_module(module).model(solver='fd', **kwargs)
+        p = candidates(board, sorted(grids), args.samples, rng)
+
+        start = time.perf_counter()
+        valid = check(p, **kwargs)
+        elapsed = time.perf_counter() - start
+        print("Puzzle %s: %s of %s candidates valid, checked in %.3f seconds (%.0f per second)" % (
+            puzzle, valid.sum(), args.samples, elapsed, args.samples / elapsed
+        ))
+
+        # The solution found by Z3 itself has to pass the check as well
+        assert s.check() == sat and verified(module, pieces(board, s.model(), grids), **kwargs)
+
+        index = np.linspace(0, args.samples - 1, min(args.fuzz, args.samples)).astype(int)
+        weaker, stronger = fuzz(module, kwargs, { name: a[index] for name, a in p.items() }, valid[index], args.cardinality)
+        print("    Z3 accepts %s invalid and rejects %s valid of %s candidates (%s of them valid)" % (weaker, stronger, len(index), valid[index].sum()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#          Copyright Rein Halbersma 2018-2021.
+# Distributed under the Boost Software License, Version 1.0.
+#    (See accompanying file LICENSE_1_0.txt or copy at
+#          http://www.boost.org/LICENSE_1_0.txt)
+
+import argparse
+from contextlib import closing
+import multiprocessing
+import queue
+import signal
+import time
+
+from catalog import boards, diagram, puzzles
+
+# Z3 and NumPy are only imported by the engines that need them, so that the native engines start fast
+
+def dp(windows=((2, 3), (3, 2)), **_):
+    from transfer_matrix import transfer_matrix
+    value, _, layout = transfer_matrix(windows)
+    return value, { 'bombs': layout }
+
+def branch_and_bound(**_):
+    from branch_and_bound import maximum_independent_set
+    from geometry import stratego
+    value, scouts = maximum_independent_set(stratego)
+    return value, { 'scouts': scouts }
+
+# Native engines of the scripts that have one
+native = {
+    'bomb_domination':    { 'dp': dp },
+    'scout_independence': { 'branch_and_bound': branch_and_bound }
+}
+
+# Engines that solve every puzzle as a 0-1 linear program, see backends.py
+backends = [ 'cpsat', 'highs' ]
+
+engines = [ 'auto', 'z3', 'dp', 'branch_and_bound' ] + backends
+
+# Encodings of the cardinality constraints, as in cardinality.py, which imports Z3
+cardinalities = [ 'native', 'arith', 'sequential', 'totalizer', 'sorting' ]
+
+# Solve a puzzle with Z3 in a worker process that sends its incumbents and its result through a queue.
+# An interrupt is left to the main process, which then reports the best solution so far and terminates the worker.
+def work(channel, puzzle, options):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from importlib import import_module
+    module, kwargs = puzzles[puzzle]
+    result = import_module(module).solve(
+        incumbent=lambda pieces, value, lower, upper: channel.put(('incumbent', pieces, value, lower, upper)),
+        **dict(kwargs, **options)
+    )
+    channel.put(('result', ) + tuple(result))
+
+# Stream the messages of the worker with their elapsed time, until its result arrives or the time budget runs out.
+# The worker is terminated on the way out, also when the caller is interrupted.
+def stream(puzzle, options, timeout=None, poll=0.5):
+    channel = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=work, args=(channel, puzzle, options), daemon=True)
+    start = time.monotonic()
+    worker.start()
+    try:
+        while True:
+            left = None if timeout is None else start + timeout - time.monotonic()
+            if left is not None and left <= 0:
+                yield time.monotonic() - start, ('timeout', )
+                return
+            try:
+                message = channel.get(timeout=poll if left is None else min(poll, left))
+            except queue.Empty:
+                if not worker.is_alive():
+                    yield time.monotonic() - start, ('failed', )
+                    return
+                continue
+            yield time.monotonic() - start, message
+            if message[0] == 'result':
+                return
+    finally:
+        worker.terminate()
+        worker.join()
+
+def anytime(puzzle, options, timeout):
+    best = None
+    try:
+        with closing(stream(puzzle, options, timeout)) as messages:
+            for elapsed, message in messages:
+                if message[0] == 'incumbent':
+                    best = message[1:]
+                    _, value, lower, upper = best
+                    print("%8.2f seconds: N == %s, %s <= N <= %s" % (elapsed, value, lower, upper), flush=True)
+                elif message[0] == 'result':
+                    _, verdict, value, pieces = message
+                    if verdict == 'sat':
+                        print("Optimum N == %s after %.2f seconds." % (value, elapsed))
+                        print(diagram(boards[puzzle], pieces))
+                        return
+                    best = (pieces, value, None, None) if pieces else best
+                    print("Z3 stopped with verdict %s after %.2f seconds." % (verdict, elapsed))
+                    break
+                else:
+                    print("Search %s after %.2f seconds." % ('ran out of time' if message[0] == 'timeout' else 'failed', elapsed))
+                    break
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    if best is None:
+        print("No solution found.")
+        return
+    pieces, value, lower, upper = best
+    print("Best N == %s%s." % (value, "" if lower is None else ", with %s <= N <= %s" % (lower, upper)))
+    print(diagram(boards[puzzle], pieces))
+
+# Several Z3 configurations in parallel, see portfolio.py
+def parallel(puzzle, options, timeout, jobs):
+    from portfolio import configurations, portfolio
+    configs = [ (module, dict(config, **options)) for module, config in configurations(puzzle) ]
+    winner = portfolio(configs, jobs, timeout)
+    if winner is None:
+        print("No configuration gave a definitive answer.")
+        return
+    (module, config), result, elapsed = winner
+    print("Optimum N == %s after %.2f seconds, by %s %s." % (result.value, elapsed, module, config))
+    print(diagram(boards[puzzle], result.pieces))
+
+def solve(args):
+    module, kwargs = puzzles[args.puzzle]
+    engine = args.engine
+    if engine == 'auto':
+        engine = next(iter(native.get(module, { 'z3': None })))
+    print("Puzzle %s (%s), %s engine" % (args.puzzle, module, engine))
+
+    if engine in backends:
+        from backends import solve as linear
+        try:
+            solution, times = linear(args.puzzle, engine, args.threads, args.timeout)
+        except ImportError as e:
+            raise SystemExit("The %s engine needs %s, which is not installed." % (engine, e.name))
+        print("%s N == %s after %.2f seconds (model %.2f seconds)." % ('Optimum' if solution.verdict == 'sat' else 'Best', solution.value, times['solve'], times['model']))
+        if solution.pieces:
+            print(diagram(boards[args.puzzle], solution.pieces))
+        return
+
+    if engine != 'z3':
+        if engine not in native.get(module, {}):
+            raise SystemExit("The %s engine does not solve puzzle %s." % (engine, args.puzzle))
+        start = time.perf_counter()
+        value, pieces = native[module][engine](**kwargs)
+        print("Optimum N == %s after %.2f seconds." % (value, time.perf_counter() - start))
+        print(diagram(boards[args.puzzle], pieces))
+        return
+
+    options = { 'cardinality': args.cardinality, 'bounds': args.bounds }
+    if args.encoding is not None:
+        from importlib import import_module
+        encodings = getattr(import_module(module), 'encodings', {})
+        if args.encoding not in encodings:
+            raise SystemExit("Puzzle %s has no encoding %s%s." % (args.puzzle, args.encoding, ", choose from %s" % ', '.join(encodings) if encodings else ""))
+        options['encoding'] = args.encoding
+    if args.hint:
+        with open(args.hint) as f:
+            options['hint'] = f.read()
+    if args.jobs > 1:
+        parallel(args.puzzle, options, args.timeout, args.jobs)
+    else:
+        anytime(args.puzzle, dict(options, seed=args.seed, tuned=not args.untuned), args.timeout)
+
+def catalog(args):
+    for name, (module, kwargs) in puzzles.items():
+        print("%-4s %-24s %s" % (name, module, ', '.join([ 'z3' ] + list(native.get(module, {})) + backends)))
+
+def main():
+    parser = argparse.ArgumentParser(prog='zed', description="Solve the Stratego puzzles.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    solver = commands.add_parser('solve', help="solve a puzzle, reporting the best solution so far while Z3 searches")
+    solver.add_argument('puzzle', choices=list(puzzles))
+    solver.add_argument('--engine', choices=engines, default='auto', help="native engine if the puzzle has one (auto, the default), Z3, or a 0-1 linear programming backend (cpsat, highs)")
+    solver.add_argument('--timeout', type=float, default=None, metavar='SECONDS', help="time budget; the best solution so far is reported when it runs out")
+    solver.add_argument('--jobs', type=int, default=1, help="run a portfolio of Z3 configurations in this many processes")
+    solver.add_argument('--threads', type=int, default=8, help="number of threads of the CP-SAT engine")
+    solver.add_argument('--cardinality', choices=cardinalities, default='native', help="encoding of the cardinality constraints (see cardinality.py)")
+    solver.add_argument('--encoding', default=None, help="encoding of the puzzle model, for the scripts that have several (e.g. pairs for puzzle V)")
+    solver.add_argument('--seed', type=int, default=0)
+    solver.add_argument('--bounds', action='store_true', help="seed the search with the bounds of bounds.py")
+    solver.add_argument('--hint', default=None, metavar='FILE', help="warm start the search from the diagram in this file")
+    solver.add_argument('--untuned', action='store_true', help="ignore the Z3 parameters that tune.py stored for the puzzle")
+    solver.set_defaults(run=solve)
+
+    lister = commands.add_parser('list', help="list the puzzles and their engines")
+    lister.set_defaults(run=catalog)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()